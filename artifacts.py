@@ -0,0 +1,96 @@
+"""
+Writing generated site files.
+
+write_if_changed() replaces a file atomically (tmp file + os.replace) and
+only when its bytes differ, so unchanged pages keep their mtime and ETag.
+With compress=True it also keeps `.gz` (and, if the brotli package is
+installed, `.br`) siblings next to the file, so a static server with
+gzip_static / brotli_static can send them without compressing per request.
+Siblings are only rebuilt when they are older than the file.
+
+Usage:
+  write_if_changed('index.html', html, compress=True)
+"""
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024  # below this the saving is lost in the response headers
+
+
+def _atomic_write(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = os.path.join(directory, f".{os.path.basename(path)}.tmp")
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _compressors():
+    yield '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data, quality=11)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_siblings(path):
+    for ext in ('.gz', '.br'):
+        _remove(path + ext)
+
+
+def precompress(path, data=None):
+    """Bring path's .gz/.br siblings up to date; returns the extensions written.
+
+    Stale siblings are removed when the file is too small to be worth
+    compressing or when brotli is no longer available, so a server never
+    serves an old compressed copy of a newer file.
+    """
+    stat = os.stat(path)
+    if stat.st_size < MIN_COMPRESS_BYTES:
+        remove_siblings(path)
+        return []
+    if brotli is None:
+        _remove(path + '.br')
+    stale = []
+    for ext, compress in _compressors():
+        try:
+            if os.path.getmtime(path + ext) >= stat.st_mtime:
+                continue
+        except FileNotFoundError:
+            pass
+        stale.append((ext, compress))
+    if stale and data is None:
+        with open(path, 'rb') as f:
+            data = f.read()
+    for ext, compress in stale:
+        _atomic_write(path + ext, compress(data))
+    return [ext for ext, _ in stale]
+
+
+def write_if_changed(path, content, compress=False):
+    """Atomically replace path with content unless it already holds those bytes.
+
+    Returns True if the file was written.
+    """
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    try:
+        with open(path, 'rb') as f:
+            changed = f.read() != data
+    except FileNotFoundError:
+        changed = True
+    if changed:
+        _atomic_write(path, data)
+    if compress:
+        precompress(path, data)
+    return changed
@@ -0,0 +1,174 @@
+"""
+Synthetic inputs for the pipeline benchmarks.
+
+Everything is generated from a seeded RNG so two runs (or two commits)
+benchmark the same data: market/news/promotion rows, RSS and Atom feeds,
+and a loopback HTTP server that answers Gamma /markets queries with
+paginated fake markets. Nothing here touches the network.
+"""
+import json
+import random
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+SEED = 20240101
+CATEGORIES = ('US Stocks', 'Taiwan Stocks', 'Tech Stocks', 'Polymarket')
+WORDS = ('model', 'market', 'agent', 'trial', 'chip', 'rally', 'study', 'patient', 'robot', 'vaccine',
+         'earnings', 'inference', 'dataset', 'benchmark', 'policy', 'launch', 'funding', 'cancer',
+         'quantum', 'sensor', 'index', 'outlook', 'surge', 'drop')
+
+
+def _title(rng, n=7):
+    return ' '.join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+
+def market_rows(n, seed=SEED):
+    """update_market_data items: category/name/price/change (+ numeric fields)."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        price = rng.uniform(1, 1000)
+        change = rng.uniform(-5, 5)
+        rows.append({'category': CATEGORIES[i % len(CATEGORIES)], 'name': f"SYM{i:07d}",
+                     'price': f"{price:,.2f}", 'change': f"{change:+.2f}%",
+                     'symbol': f"SYM{i:07d}", 'value': price, 'change_pct': change})
+    return rows
+
+
+def news_records(n, seed=SEED, duplicate_ratio=0.2):
+    """update_news records; about duplicate_ratio of them repeat an earlier title."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    records = []
+    for i in range(n):
+        if records and rng.random() < duplicate_ratio:
+            title = rng.choice(records)['title']
+        else:
+            title = f"{_title(rng)} {i}"
+        records.append({
+            'category': 'ai' if i % 2 else 'health', 'title': title, 'source': f"Source {i % 8}",
+            'link': f"https://news.example.com/{i}?utm_source=feed", 'summary': _title(rng, 30),
+            'fetched_at': (start + timedelta(seconds=rng.randrange(86400 * 365))).isoformat(),
+            'tags': [], 'recommendation': _title(rng, 12), 'excerpt': _title(rng, 20),
+        })
+    return records
+
+
+def promotion_rows(n, seed=SEED):
+    rng = random.Random(seed)
+    return [{'platform': rng.choice(('Steam', 'Epic', 'PS Store')), 'name': f"Game {i} {_title(rng, 3)}",
+             'deal_price': f"NT${rng.randrange(50, 1500)}", 'original_price': f"NT${rng.randrange(1500, 2500)}",
+             'url': f"https://store.example.com/app/{i}"} for i in range(n)]
+
+
+def rss_feed(n, seed=SEED):
+    rng = random.Random(seed)
+    items = ''.join(
+        f"<item><title>{escape(_title(rng))} {i}</title><link>https://feed.example.com/{i}</link>"
+        f"<description>{escape(_title(rng, 40))}</description>"
+        f"<pubDate>Mon, 01 Jan 2024 00:{i % 60:02d}:00 GMT</pubDate></item>"
+        for i in range(n))
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Bench</title>'
+            f'{items}</channel></rss>').encode('utf-8')
+
+
+def atom_feed(n, seed=SEED):
+    rng = random.Random(seed)
+    entries = ''.join(
+        f'<entry><title>{escape(_title(rng))} {i}</title><link href="https://feed.example.com/a/{i}"/>'
+        f"<summary>{escape(_title(rng, 40))}</summary><updated>2024-01-01T00:00:00Z</updated></entry>"
+        for i in range(n))
+    return (f'<?xml version="1.0" encoding="utf-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+            f'<title>Bench</title>{entries}</feed>').encode('utf-8')
+
+
+def gamma_markets(query, n, seed=SEED):
+    rng = random.Random(f"{seed}-{query}")
+    markets = []
+    for i in range(n):
+        yes = rng.random()
+        markets.append({'id': f"{query}-{i}", 'question': f"{query}: {_title(rng)} #{i}?",
+                        'slug': f"{query}-{i}", 'outcomes': '["Yes", "No"]',
+                        'outcomePrices': json.dumps([f"{yes:.3f}", f"{1 - yes:.3f}"]),
+                        'oneDayPriceChange': rng.uniform(-0.1, 0.1)})
+    return markets
+
+
+class FakeGamma:
+    """Loopback Gamma API: GET /markets?query=&limit=&offset= pages through
+    `per_query` synthetic markets for every query.
+
+    `errors[query]` is a list of (status, headers) answers served, one per
+    request, before the query succeeds; `requests` logs every (query, offset).
+    """
+
+    def __init__(self, per_query):
+        self.per_query = per_query
+        self.markets = {}
+        self.errors = {}
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                q = parse_qs(urlsplit(self.path).query)
+                query = q.get('query', [''])[0]
+                offset, limit = int(q.get('offset', ['0'])[0]), int(q.get('limit', ['100'])[0])
+                fake.requests.append((query, offset))
+                if fake.errors.get(query):
+                    status, headers = fake.errors[query].pop(0)
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if query not in fake.markets:
+                    fake.markets[query] = gamma_markets(query, fake.per_query)
+                body = json.dumps(fake.markets[query][offset:offset + limit]).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def build_db(path, markets=(), promotions=(), news=()):
+    """Create a joeclaw.db-shaped database filled with the given rows."""
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("""CREATE TABLE IF NOT EXISTS market_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, category TEXT NOT NULL, name TEXT NOT NULL,
+            price TEXT NOT NULL, change TEXT NOT NULL)""")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS market_data_key ON market_data (category, name)")
+        conn.executemany("INSERT INTO market_data (category, name, price, change) VALUES (:category, :name, :price, :change)",
+                         markets)
+        conn.execute("""CREATE TABLE IF NOT EXISTS promotions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, platform TEXT, name TEXT, deal_price TEXT,
+            original_price TEXT, url TEXT, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
+        conn.executemany("""INSERT INTO promotions (platform, name, deal_price, original_price, url)
+            VALUES (:platform, :name, :deal_price, :original_price, :url)""", promotions)
+    conn.close()
+    if news:
+        import update_news
+        saved = update_news.DB
+        update_news.DB = path
+        try:
+            update_news.store_news(news)
+        finally:
+            update_news.DB = saved
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the update pipeline.
+
+Each stage runs against synthetic fixtures (benchmarks/fixtures.py) in a
+throwaway directory: no network, and the real joeclaw.db, index.html and
+public/ are never touched. For every stage and size we record the best and
+median wall time over --repeat runs, throughput (items per second) and the
+peak Python heap (tracemalloc, measured in one extra run so it does not
+slow the timed ones). The JSON report is written to
+benchmarks/results/<commit>.json; pass --baseline to compare with another
+report.
+
+Usage:
+  python3 benchmarks/run.py
+  python3 benchmarks/run.py --sizes 1000,100000,1000000 --only store_news,generate_html
+  python3 benchmarks/run.py --baseline benchmarks/results/1a2b3c4.json
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+DEFAULT_SIZES = (1000, 10000)
+GAMMA_QUERIES = ('bench-a', 'bench-b', 'bench-c', 'bench-d')
+NEWS_PER_CATEGORY = 20  # public/news/<cat>.json keeps the latest 20
+
+
+def commit_id():
+    try:
+        sha = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD', '--', '*.py'], cwd=ROOT).returncode != 0
+        return sha + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def measure(setup, fn, repeat):
+    """Return ([seconds per run], peak traced bytes); setup() runs untimed before each call."""
+    times = []
+    for _ in range(repeat):
+        args = setup()
+        gc.collect()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    args = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return times, peak
+
+
+# Each benchmark takes (rows, workdir) and returns (setup, fn, items, cleanup).
+
+def bench_get_polymarket_data(n, work):
+    import update_market_data
+    from fixtures import FakeGamma
+    per_query = math.ceil(n / len(GAMMA_QUERIES))
+    fake = FakeGamma(per_query)
+    kwargs = {'base_url': fake.url, 'max_pages': per_query // 100 + 2, 'backoff': 0}
+    fn = lambda: update_market_data.get_polymarket_data(list(GAMMA_QUERIES), **kwargs)
+    return (lambda: ()), fn, per_query * len(GAMMA_QUERIES), fake.close
+
+
+def bench_parse_rss_feed(n, work):
+    from fixtures import rss_feed
+    import update_news
+    feed = rss_feed(n)
+    return (lambda: (feed,)), (lambda data: update_news.parse_rss_feed(data, limit=n)), n, None
+
+
+def bench_parse_atom_feed(n, work):
+    from fixtures import atom_feed
+    import update_news
+    feed = atom_feed(n)
+    return (lambda: (feed,)), (lambda data: update_news.parse_rss_feed(data, limit=n)), n, None
+
+
+def bench_dedupe_keep_latest(n, work):
+    from fixtures import news_records
+    import update_news
+    records = news_records(n)
+    return (lambda: (list(records),)), update_news.dedupe_keep_latest, n, None
+
+
+def _fresh_db(path):
+    for suffix in ('', '-wal', '-shm'):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path + suffix)
+
+
+def bench_market_update_db(n, work):
+    from fixtures import market_rows
+    import update_market_data
+    rows = market_rows(n)
+    path = update_market_data.DB_PATH = os.path.join(work, 'market.db')
+    return (lambda: _fresh_db(path) or (rows,)), update_market_data.update_db, n, None
+
+
+def bench_market_update_db_unchanged(n, work):
+    """Upsert of rows that are already stored (the common cron case)."""
+    from fixtures import market_rows
+    import update_market_data
+    rows = market_rows(n)
+    path = update_market_data.DB_PATH = os.path.join(work, 'market-unchanged.db')
+    _fresh_db(path)
+    update_market_data.update_db(rows)
+    return (lambda: (rows,)), update_market_data.update_db, n, None
+
+
+def bench_promotions_update_db(n, work):
+    from fixtures import promotion_rows
+    import update_promotions
+    rows = promotion_rows(n)
+    path = update_promotions.DB_PATH = os.path.join(work, 'promotions.db')
+    return (lambda: _fresh_db(path) or (rows,)), update_promotions.update_db, n, None
+
+
+def bench_store_news(n, work):
+    from fixtures import news_records
+    import update_news
+    records = news_records(n)
+    path = update_news.DB = os.path.join(work, 'news.db')
+    return (lambda: _fresh_db(path) or (records,)), update_news.store_news, n, None
+
+
+def _site(n, work, name):
+    """A workspace for generate_html with n market rows and n promotions."""
+    from fixtures import build_db, market_rows, news_records, promotion_rows
+    import update_html
+    site = os.path.join(work, name)
+    os.makedirs(os.path.join(site, 'news'), exist_ok=True)
+    build_db(os.path.join(site, 'joeclaw.db'), market_rows(n), promotion_rows(n))
+    records = news_records(2 * NEWS_PER_CATEGORY)
+    for cat in ('ai', 'health'):
+        with open(os.path.join(site, 'news', f'{cat}.json'), 'w', encoding='utf-8') as f:
+            json.dump([r for r in records if r['category'] == cat], f, ensure_ascii=False)
+    update_html.db_path = os.path.join(site, 'joeclaw.db')
+    update_html.html_path = os.path.join(site, 'index.html')
+    update_html.pages_dir = site
+    update_html.news_public_dir = os.path.join(site, 'news')
+    update_html.api_dir = os.path.join(site, 'api')
+    update_html.assets_dir = os.path.join(site, 'assets')
+    update_html.render_cache_path = os.path.join(site, 'render_cache.json')
+    return site
+
+
+def bench_generate_html(n, work):
+    """Cold render: no render cache, every file rewritten."""
+    import update_html
+    site = _site(n, work, f'site-cold-{n}')
+
+    def setup():
+        for sub in ('api', 'assets'):
+            shutil.rmtree(os.path.join(site, sub), ignore_errors=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(update_html.render_cache_path)
+        shutil.copyfile(os.path.join(ROOT, 'index.html'), update_html.html_path)
+        return ()
+    return setup, update_html.generate_html, n, None
+
+
+def bench_generate_html_warm(n, work):
+    """Re-run with unchanged inputs: everything comes from the render cache."""
+    import update_html
+    _site(n, work, f'site-warm-{n}')
+    shutil.copyfile(os.path.join(ROOT, 'index.html'), update_html.html_path)
+    update_html.generate_html()
+    return (lambda: ()), update_html.generate_html, n, None
+
+
+BENCHMARKS = {
+    'get_polymarket_data': bench_get_polymarket_data,
+    'parse_rss_feed': bench_parse_rss_feed,
+    'parse_rss_feed[atom]': bench_parse_atom_feed,
+    'dedupe_keep_latest': bench_dedupe_keep_latest,
+    'market.update_db': bench_market_update_db,
+    'market.update_db[unchanged]': bench_market_update_db_unchanged,
+    'promotions.update_db': bench_promotions_update_db,
+    'store_news': bench_store_news,
+    'generate_html': bench_generate_html,
+    'generate_html[warm]': bench_generate_html_warm,
+}
+
+
+def run(sizes, names, repeat):
+    work = tempfile.mkdtemp(prefix='joeclaw-bench-')
+    # anything that falls back to db.DB_PATH must not reach the real database
+    os.environ['JOECLAW_DB'] = os.path.join(work, 'joeclaw.db')
+    # generate_html queues publishes; keep them (and the job locks) out of the repo
+    import joblock
+    import publish
+    joblock.LOCK_DIR = os.path.join(work, 'locks')
+    publish.QUEUE_PATH = os.path.join(work, 'publish-queue.json')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    try:
+        for n in sizes:
+            for name in names:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    setup, fn, items, cleanup = BENCHMARKS[name](n, work)
+                    try:
+                        times, peak = measure(setup, fn, repeat)
+                    finally:
+                        if cleanup:
+                            cleanup()
+                best = min(times)
+                result = {'benchmark': name, 'rows': n, 'items': items, 'best_s': round(best, 6),
+                          'median_s': round(statistics.median(times), 6),
+                          'items_per_s': round(items / best, 1) if best else None, 'peak_mem_bytes': peak}
+                results.append(result)
+                print(f"{name:<30} {n:>9} rows  best {best * 1000:10.2f} ms  "
+                      f"{result['items_per_s'] or 0:>14,.0f} items/s  peak {peak / 1e6:8.2f} MB", flush=True)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    old = {(r['benchmark'], r['rows']): r for r in baseline['results']}
+    print(f"\nvs {baseline.get('commit', baseline_path)} (time ratio < 1 is faster):")
+    for r in results:
+        prev = old.get((r['benchmark'], r['rows']))
+        if prev and prev['best_s']:
+            print(f"{r['benchmark']:<30} {r['rows']:>9} rows  time x{r['best_s'] / prev['best_s']:.2f}  "
+                  f"peak x{r['peak_mem_bytes'] / max(prev['peak_mem_bytes'], 1):.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated row counts (default: %(default)s)')
+    parser.add_argument('--only', help='comma-separated benchmark names: ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='report path (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--baseline', help='earlier report to compare against')
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    commit = commit_id()
+    results = run(sizes, names, max(args.repeat, 1))
+    report = {'commit': commit, 'created': datetime.now().isoformat(timespec='seconds'),
+              'python': platform.python_version(), 'platform': platform.platform(),
+              'repeat': args.repeat, 'results': results}
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Local status server for the agent activity dashboard.
+
+Keeps public/status.json in memory and serves public/ on 127.0.0.1:9000:
+
+  GET  /status.json   current status (from memory)
+  GET  /events        server-sent events: one `snapshot` with the whole
+                      status, then an `update` per change carrying only the
+                      changed fields and the new log entry
+  POST /update        JSON body with update_status.py's fields
+                      (task, step, detail, progress, status, append_log)
+  GET  /...           static files under public/ (status-ui, news, ...)
+
+Updates are applied in memory and pushed to connected browsers at once;
+the status file is rewritten at most every PERSIST_INTERVAL seconds and on
+shutdown, instead of once per update.
+
+Usage:
+  python3 bin/status_server.py [--host 127.0.0.1] [--port 9000]
+"""
+import argparse, asyncio, json, mimetypes, os, signal, sys, time
+from urllib.parse import unquote, urlsplit
+
+from update_status import W, STATUS_PATH, apply_update, append_activity, load_status, ring, to_json, write_status
+
+PUBLIC_DIR = os.path.join(W, 'public')
+PID_PATH = os.path.join(W, '.status_server.pid')
+PERSIST_INTERVAL = 5     # seconds between status file writes while dirty
+KEEPALIVE = 15           # seconds between SSE comments so proxies keep the stream open
+MAX_BODY = 64 * 1024
+CLIENT_QUEUE = 100       # pending events per browser before it is dropped as too slow
+REASONS = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {to_json(data)}\n\n".encode('utf-8')
+
+
+class StatusServer:
+    def __init__(self, status_path=STATUS_PATH, public_dir=PUBLIC_DIR, persist_interval=PERSIST_INTERVAL):
+        self.status_path = status_path
+        self.public_dir = os.path.realpath(public_dir)
+        self.persist_interval = persist_interval
+        self.status = load_status(status_path)
+        self.status['recent_logs'] = ring(self.status.get('recent_logs'))
+        self.dirty = False
+        self.clients = set()
+
+    def update(self, fields):
+        changed, entry = apply_update(self.status, fields)
+        if entry:
+            append_activity(entry['msg'])
+        self.dirty = True
+        self.publish('update', {'changed': changed, 'log': entry})
+        return changed
+
+    def publish(self, event, data):
+        chunk = sse(event, data)
+        for queue in list(self.clients):
+            try:
+                queue.put_nowait(chunk)
+            except asyncio.QueueFull:
+                # the browser will reconnect and get a fresh snapshot
+                self.disconnect(queue)
+
+    def disconnect(self, queue):
+        """End one event stream; its handler closes the connection."""
+        self.clients.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def persist(self):
+        if self.dirty:
+            self.dirty = False
+            write_status(self.status, self.status_path)
+
+    async def persist_loop(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            try:
+                self.persist()
+            except OSError as e:
+                print(f"Warning: could not write {self.status_path}: {e}")
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            method, target, _ = request.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            path = unquote(urlsplit(target).path)
+
+            if path == '/events' and method == 'GET':
+                await self.stream(writer)
+            elif path == '/update':
+                if method != 'POST':
+                    await self.respond(writer, 405, b'')
+                    return
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, b'')
+                    return
+                try:
+                    fields = json.loads(await reader.readexactly(length) or b'{}')
+                    if not isinstance(fields, dict):
+                        raise ValueError('expected a JSON object')
+                    # rejects bad field types before the status is touched
+                    changed = self.update(fields)
+                except ValueError as e:
+                    await self.respond(writer, 400, str(e).encode('utf-8'))
+                    return
+                await self.respond(writer, 200, json.dumps({'ok': True, 'changed': changed}).encode('utf-8'), 'application/json')
+            elif method in ('GET', 'HEAD'):
+                await self.serve_file(writer, path, head=method == 'HEAD')
+            else:
+                await self.respond(writer, 405, b'')
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, code, body, content_type='text/plain; charset=utf-8', head=False):
+        writer.write((f"HTTP/1.1 {code} {REASONS.get(code, '')}\r\n"
+                      f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                      "Cache-Control: no-cache\r\nConnection: close\r\n\r\n").encode('latin-1'))
+        if not head:
+            writer.write(body)
+        await writer.drain()
+
+    async def serve_file(self, writer, path, head=False):
+        if path == '/status.json':
+            body = to_json(self.status).encode('utf-8')
+            await self.respond(writer, 200, body, 'application/json', head)
+            return
+        full = os.path.realpath(os.path.join(self.public_dir, path.lstrip('/')))
+        if os.path.isdir(full):
+            full = os.path.join(full, 'index.html')
+        if not full.startswith(self.public_dir + os.sep) or not os.path.isfile(full):
+            await self.respond(writer, 404, b'not found', head=head)
+            return
+        with open(full, 'rb') as f:
+            body = f.read()
+        await self.respond(writer, 200, body, mimetypes.guess_type(full)[0] or 'application/octet-stream', head)
+
+    async def stream(self, writer):
+        queue = asyncio.Queue(CLIENT_QUEUE)
+        self.clients.add(queue)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n"
+                         b"retry: 3000\n\n" + sse('snapshot', self.status))
+            await writer.drain()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(queue.get(), KEEPALIVE)
+                except asyncio.TimeoutError:
+                    chunk = b": keepalive\n\n"
+                if chunk is None:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+        finally:
+            self.clients.discard(queue)
+
+
+async def serve(host, port):
+    server = StatusServer()
+    tcp = await asyncio.start_server(server.handle, host, port)
+    persister = asyncio.create_task(server.persist_loop())
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    with open(PID_PATH, 'w') as f:
+        f.write(str(os.getpid()))
+    print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} status server on http://{host}:{port}/ serving {PUBLIC_DIR}")
+    try:
+        await stop.wait()
+    finally:
+        persister.cancel()
+        tcp.close()
+        for queue in list(server.clients):
+            server.disconnect(queue)
+        await asyncio.sleep(0.1)  # let the stream handlers finish
+        server.persist()
+        try:
+            os.remove(PID_PATH)
+        except FileNotFoundError:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    args = parser.parse_args(argv)
+    sys.stdout.reconfigure(line_buffering=True)
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
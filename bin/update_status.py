@@ -3,47 +3,176 @@
 Simple helper to update public/status.json and append to logs/agent-activity.log
 Usage example:
   python3 bin/update_status.py --task "Update OpenClaw" --step "installing" --detail "npm i -g openclaw" --progress 40 --status running
+
+If bin/status_server.py is running the update is POSTed to it (it keeps the
+status in memory and pushes it to the status UI); otherwise the status file
+is rewritten directly.
+
+recent_logs is kept as a fixed-size ring (deque) so adding an entry is O(1);
+agent-activity.log is rotated daily or once it passes MAX_LOG_BYTES, and old
+logs are kept gzip-compressed (the newest LOG_BACKUPS of them).
 """
-import argparse, json, time, os
-W = os.path.dirname(os.path.dirname(__file__))
+import argparse, glob, gzip, json, shutil, time, os, sys
+import urllib.request
+from collections import deque
+W = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, W)
+from artifacts import write_if_changed
 STATUS_PATH = os.path.join(W, 'public', 'status.json')
 LOG_PATH = os.path.join(W, 'logs', 'agent-activity.log')
+SERVER_URL = os.environ.get('STATUS_SERVER_URL', 'http://127.0.0.1:9000')
+MAX_RECENT_LOGS = 200
+MAX_LOG_BYTES = 1024 * 1024
+LOG_BACKUPS = 14
+# update field -> status key
+FIELDS = {'task': 'current_task', 'step': 'step', 'detail': 'step_detail', 'progress': 'progress', 'status': 'last_status'}
+
+
+def default_status():
+    return {'current_task':'idle','step':None,'step_detail':None,'progress':0,'last_status':'ok','recent_logs':[], 'updated': None}
+
+
+def load_status(path=STATUS_PATH):
+    try:
+        with open(path,'r') as f:
+            return json.load(f)
+    except Exception:
+        return default_status()
+
+
+def ring(logs):
+    """recent_logs as a bounded deque, newest first."""
+    if isinstance(logs, deque) and logs.maxlen == MAX_RECENT_LOGS:
+        return logs
+    return deque(logs or (), maxlen=MAX_RECENT_LOGS)
+
+
+def to_json(status, indent=None):
+    return json.dumps(status, indent=indent, ensure_ascii=False, default=list)
+
+
+def clean_update(update):
+    """Return a copy of update with text fields as str and progress as float.
+
+    Raises ValueError for values that can't be converted (objects, lists,
+    non-numeric progress), so a bad update is rejected before it changes
+    anything. Unknown keys are dropped.
+    """
+    clean = {}
+    for field in (*FIELDS, 'append_log'):
+        value = update.get(field)
+        if value is None:
+            continue
+        if isinstance(value, (dict, list)):
+            raise ValueError(f"{field} must be a string or number")
+        if field == 'progress':
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"progress must be a number, not {value!r}") from None
+        else:
+            value = str(value)
+        clean[field] = value
+    return clean
+
+
+def apply_update(status, update, now=None):
+    """Apply an update dict (keys of FIELDS plus 'append_log') to status in place.
+
+    The update is checked with clean_update() first, so a ValueError leaves
+    status untouched. Returns (changed, log_entry): the status keys that
+    changed and the new recent_logs entry, or None when there is no message.
+    """
+    update = clean_update(update)
+    now = now if now is not None else int(time.time()*1000)
+    changed = {}
+    for field, key in FIELDS.items():
+        value = update.get(field)
+        if value is None or (field == 'task' and not value):
+            continue
+        if status.get(key) != value:
+            status[key] = value
+            changed[key] = value
+    status['updated'] = changed['updated'] = now
+    msg = update.get('append_log') or (update.get('task') or '') + ('. ' + update['detail'] if update.get('detail') else '')
+    entry = None
+    if msg:
+        entry = {'ts': now, 'msg': msg}
+        status['recent_logs'] = ring(status.get('recent_logs'))
+        status['recent_logs'].appendleft(entry)
+    return changed, entry
+
+
+def write_status(status, path=STATUS_PATH):
+    # plus .gz/.br siblings for the static server
+    return write_if_changed(path, to_json(status, indent=2), compress=True)
+
+
+def rotate_activity(path=LOG_PATH, max_bytes=MAX_LOG_BYTES, keep=LOG_BACKUPS, now=None):
+    """Compress the activity log to <path>.<YYYYmmdd-HHMMSS>.gz when it is too
+    big or was last written on an earlier day. Returns the archive path or None."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    today = time.strftime('%Y-%m-%d', time.localtime(now))
+    if st.st_size < max_bytes and time.strftime('%Y-%m-%d', time.localtime(st.st_mtime)) == today:
+        return None
+    archive = f"{path}.{time.strftime('%Y%m%d-%H%M%S', time.localtime(st.st_mtime))}.gz"
+    claimed = f"{path}.rotating-{os.getpid()}"
+    try:
+        os.rename(path, claimed)  # only one writer wins the rotation
+    except FileNotFoundError:
+        return None
+    with open(claimed, 'rb') as src, gzip.open(archive + '.tmp', 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(archive + '.tmp', archive)
+    os.remove(claimed)
+    for old in sorted(glob.glob(f"{glob.escape(path)}.*.gz"))[:-keep]:
+        os.remove(old)
+    return archive
+
+
+def append_activity(msg, path=LOG_PATH):
+    rotate_activity(path)
+    with open(path,'a') as lf:
+        lf.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} | {msg}\n")
+
+
+def post_update(update, url=SERVER_URL, timeout=2):
+    """Send the update to a running status server; False if none answers."""
+    req = urllib.request.Request(url + '/update', data=json.dumps(update).encode('utf-8'),
+                                 headers={'Content-Type': 'application/json'}, method='POST')
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status == 200
+    except OSError:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--task')
+    parser.add_argument('--step')
+    parser.add_argument('--detail')
+    parser.add_argument('--progress', type=float)
+    parser.add_argument('--status')
+    parser.add_argument('--append-log', help='extra message to append to activity log')
+    parser.add_argument('--no-server', action='store_true', help='always rewrite the status file directly')
+    args = parser.parse_args(argv)
+    update = {k: v for k, v in vars(args).items() if k != 'no_server' and v is not None}
+
+    if not args.no_server and post_update(update):
+        print('updated', SERVER_URL)
+        return
+
+    status = load_status()
+    _, entry = apply_update(status, update)
+    write_status(status)
+    if entry:
+        append_activity(entry['msg'])
+    print('updated', STATUS_PATH)
+
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--task')
-parser.add_argument('--step')
-parser.add_argument('--detail')
-parser.add_argument('--progress', type=float)
-parser.add_argument('--status')
-parser.add_argument('--append-log', help='extra message to append to activity log')
-args = parser.parse_args()
-
-now = int(time.time()*1000)
-# load existing
-try:
-    with open(STATUS_PATH,'r') as f:
-        status = json.load(f)
-except Exception:
-    status = {'current_task':'idle','step':None,'step_detail':None,'progress':0,'last_status':'ok','recent_logs':[], 'updated': None}
-
-if args.task: status['current_task'] = args.task
-if args.step is not None: status['step'] = args.step
-if args.detail is not None: status['step_detail'] = args.detail
-if args.progress is not None: status['progress'] = args.progress
-if args.status is not None: status['last_status'] = args.status
-status['updated'] = now
-# append recent log (keep last 200)
-msg = args.append_log or (args.task or '') + ('. ' + args.detail if args.detail else '')
-if msg:
-    status.setdefault('recent_logs',[]).insert(0, {'ts': now, 'msg': msg})
-    status['recent_logs'] = status['recent_logs'][:200]
-
-# write status file
-with open(STATUS_PATH,'w') as f:
-    json.dump(status, f, indent=2, ensure_ascii=False)
-
-# append to activity log
-with open(LOG_PATH,'a') as lf:
-    lf.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} | {msg}\n")
-
-print('updated', STATUS_PATH)
+if __name__ == '__main__':
+    main()
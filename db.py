@@ -0,0 +1,66 @@
+"""
+Shared SQLite access for every job.
+
+All scripts open joeclaw.db through connect(), which applies the same
+pragmas everywhere:
+
+  journal_mode=WAL      readers never block the writer and vice versa
+  synchronous=NORMAL    fsync at checkpoints only; safe with WAL
+  busy_timeout          wait for a competing writer instead of failing
+                        with "database is locked"
+  mmap_size             read pages through the OS page cache
+
+Writes go through transaction(), which starts with BEGIN IMMEDIATE so the
+write lock is taken up front (no deadlocking lock upgrade between two
+concurrent jobs) and batches everything into one commit. Statements are
+kept in sqlite3's per-connection prepared-statement cache, so callers
+should pass the same SQL string (a module constant) on every call.
+
+Usage:
+  conn = db.connect()
+  with db.transaction(conn):
+      conn.executemany(INSERT_SQL, rows)
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get('JOECLAW_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'joeclaw.db'))
+BUSY_TIMEOUT_MS = 10000
+MMAP_SIZE = 64 * 1024 * 1024
+CACHED_STATEMENTS = 256
+
+
+def connect(path=None, readonly=False):
+    path = path or DB_PATH
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT_MS / 1000,
+                               cached_statements=CACHED_STATEMENTS)
+    else:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=CACHED_STATEMENTS)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    return conn
+
+
+@contextmanager
+def transaction(conn):
+    """Run the block as one write transaction (BEGIN IMMEDIATE ... COMMIT)."""
+    if conn.in_transaction:
+        # flush an implicit transaction opened by an earlier statement
+        conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+def checkpoint(conn):
+    """Fold the WAL back into the main database file (e.g. before copying it)."""
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
@@ -0,0 +1,106 @@
+"""
+Persistent HTTP validator cache for news feeds.
+
+For every feed URL we keep the ETag / Last-Modified validators from the last
+200 response together with the items parsed from it. The next fetch sends
+If-None-Match / If-Modified-Since; on a 304 the cached items are reused and
+the body is neither downloaded nor parsed.
+
+The cache is a single JSON file written atomically. It is bounded both by
+entry count and by serialized size; least recently used URLs are evicted
+first. Access is guarded by a lock because feeds are fetched from a thread
+pool.
+"""
+import json
+import os
+import threading
+import time
+
+MAX_ENTRIES = 500
+MAX_BYTES = 5 * 1024 * 1024
+
+
+class FeedCache:
+    def __init__(self, path, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.entries = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Warning: ignoring unreadable feed cache {path}: {e}")
+
+    def conditional_headers(self, url):
+        """Request headers that turn the next GET of url into a conditional one."""
+        with self._lock:
+            entry = self.entries.get(url)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def items(self, url, limit=None):
+        """Cached items for url, or None if they cannot satisfy `limit`."""
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            if limit is not None and entry.get('limit', 0) < limit and len(entry['items']) >= entry.get('limit', 0):
+                # cached parse was truncated to fewer items than now requested
+                return None
+            entry['used'] = time.time()
+            self._dirty = True
+            items = entry['items']
+        return items[:limit] if limit is not None else list(items)
+
+    def store(self, url, etag, last_modified, items, limit=None):
+        if not etag and not last_modified:
+            # nothing to revalidate with; caching would only waste space
+            with self._lock:
+                if self.entries.pop(url, None) is not None:
+                    self._dirty = True
+            return
+        now = time.time()
+        with self._lock:
+            self.entries[url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'items': items,
+                'limit': limit if limit is not None else len(items),
+                'stored': now,
+                'used': now,
+            }
+            self._dirty = True
+
+    def _evict(self):
+        by_age = sorted(self.entries, key=lambda u: self.entries[u].get('used', 0))
+        while len(by_age) > self.max_entries:
+            del self.entries[by_age.pop(0)]
+        sizes = {u: len(json.dumps([u, e], ensure_ascii=False).encode('utf-8')) for u, e in self.entries.items()}
+        total = sum(sizes.values())
+        while by_age and total > self.max_bytes:
+            url = by_age.pop(0)
+            total -= sizes[url]
+            del self.entries[url]
+        return json.dumps(self.entries, ensure_ascii=False)
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = self._evict()
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp, self.path)
@@ -0,0 +1,173 @@
+"""
+Overlap-safe job runs.
+
+Each job holds an flock() on .cache/locks/<name>.lock while it runs. The
+kernel drops the lock when the holder exits or crashes, so a dead run never
+leaves a stale lock behind; the file also records the holder's pid and
+start time, and a holder older than STALE_AFTER is reported as stuck.
+
+A trigger that finds the job already running does not wait or run in
+parallel: it sets .cache/locks/<name>.pending and returns. When the running
+job finishes it checks the flag and runs once more, so any number of
+overlapping triggers coalesce into a single follow-up run.
+
+Usage:
+  @joblock.exclusive('html')
+  def generate_html(): ...        # returns None when coalesced
+
+  with joblock.lock('git', wait=120):
+      ...                         # raises JobBusy after 120s
+"""
+import fcntl
+import functools
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+LOCK_DIR = os.environ.get('JOECLAW_LOCK_DIR',
+                          os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'locks'))
+STALE_AFTER = 30 * 60  # seconds before a running holder is reported as stuck
+MAX_RERUNS = 3         # follow-up runs per trigger, in case triggers never stop
+POLL = 0.2
+
+_held = set()
+_held_lock = threading.Lock()
+
+
+class JobBusy(RuntimeError):
+    pass
+
+
+def _path(name, ext):
+    return os.path.join(LOCK_DIR, f"{name}.{ext}")
+
+
+def holder(name):
+    """{'pid', 'host', 'started'} of the last process to take the lock, or None."""
+    try:
+        with open(_path(name, 'lock'), 'r', encoding='utf-8') as f:
+            return json.loads(f.read() or 'null')
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _report_busy(name):
+    info = holder(name)
+    if not info:
+        return
+    age = time.time() - info.get('started', time.time())
+    if age > STALE_AFTER:
+        print(f"Warning: {name} has been held by pid {info.get('pid')} on {info.get('host')} "
+              f"for {age / 60:.0f} min; it may be stuck")
+
+
+def _try_lock(name):
+    """Return an open, locked file object, or None if another process holds it."""
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    f = open(_path(name, 'lock'), 'a+', encoding='utf-8')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    f.seek(0)
+    f.truncate()
+    f.write(json.dumps({'pid': os.getpid(), 'host': socket.gethostname(), 'started': time.time()}))
+    f.flush()
+    return f
+
+
+def _unlock(f):
+    try:
+        f.seek(0)
+        f.truncate()
+        fcntl.flock(f, fcntl.LOCK_UN)
+    finally:
+        f.close()
+
+
+@contextmanager
+def lock(name, wait=0):
+    """Hold the named lock for the block, waiting up to `wait` seconds.
+
+    Re-entrant within a process. Raises JobBusy if the lock stays taken.
+    """
+    with _held_lock:
+        reentrant = name in _held
+        if not reentrant:
+            _held.add(name)
+    if reentrant:
+        yield
+        return
+    try:
+        deadline = time.monotonic() + wait
+        f = _try_lock(name)
+        while f is None and time.monotonic() < deadline:
+            time.sleep(POLL)
+            f = _try_lock(name)
+        if f is None:
+            _report_busy(name)
+            raise JobBusy(f"{name} is already running")
+        try:
+            yield
+        finally:
+            _unlock(f)
+    finally:
+        with _held_lock:
+            _held.discard(name)
+
+
+def request_rerun(name):
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    with open(_path(name, 'pending'), 'w', encoding='utf-8') as f:
+        f.write(str(time.time()))
+
+
+def _take_pending(name):
+    try:
+        os.remove(_path(name, 'pending'))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def run_exclusive(name, fn, *args, **kwargs):
+    """Run fn under the named lock, coalescing overlapping triggers.
+
+    If the job is already running, a rerun is requested and None returned.
+    Otherwise fn runs, then runs again while reruns were requested during
+    it (at most MAX_RERUNS times); the last result is returned.
+    """
+    with _held_lock:
+        reentrant = name in _held
+    if reentrant:
+        # already inside this job in this process
+        return fn(*args, **kwargs)
+
+    request_rerun(name)
+    result = None
+    for _ in range(1 + MAX_RERUNS):
+        if not os.path.exists(_path(name, 'pending')):
+            break
+        try:
+            with lock(name):
+                if not _take_pending(name):
+                    break  # another run picked the request up
+                result = fn(*args, **kwargs)
+        except JobBusy:
+            print(f"{name} is already running; queued one follow-up run.")
+            break
+    return result
+
+
+def exclusive(name):
+    """Decorator form of run_exclusive()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return run_exclusive(name, fn, *args, **kwargs)
+        return wrapper
+    return decorate
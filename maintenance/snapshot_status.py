@@ -3,9 +3,9 @@
 Snapshot status.json (host-side)
 - If workspace/status.json exists, copy it to data/status-YYYYMMDD-HHMMSS.json
 - Else, produce a small status JSON from system commands
-- Commit snapshot to a timestamped branch and push, attempt to create PR with gh if available
+- Queue the snapshot in the publish queue (publish.py), which commits it with the next batch
 """
-import os,sys,shutil,subprocess,datetime,json
+import sys,shutil,subprocess,datetime,json
 from pathlib import Path
 ROOT=Path(__file__).resolve().parents[1]
 DATA=ROOT/"data"
@@ -40,32 +40,10 @@ else:
     out.write_text(json.dumps(j,indent=2),encoding='utf-8')
     source='generated'
 
-# Git: create branch, add file, commit, push
-os.chdir(ROOT)
-branch=f'maintenance/snapshot-{ts}'
-# create branch
-subprocess.run(['git','fetch','--all'])
-subprocess.run(['git','checkout','-b',branch])
-subprocess.run(['git','add',str(out)])
-cm=f'Add status snapshot {out.name}'
-subprocess.run(['git','commit','-m',cm])
-# push branch
-push_proc=subprocess.run(['git','push','origin',branch], capture_output=True, text=True)
-print('git push rc', push_proc.returncode)
-# try to create PR with gh if available
-gh_path=shutil.which('gh')
-if gh_path:
-    title=f'Automated snapshot: {ts}'
-    body=f'This PR contains an automated status snapshot generated from {source}.'
-    try:
-        pr=subprocess.run(['gh','pr','create','--title',title,'--body',body,'--base','main','--head',branch], capture_output=True, text=True)
-        print('gh pr create rc', pr.returncode)
-        print(pr.stdout)
-    except Exception as e:
-        print('gh pr error', e)
-else:
-    print('gh CLI not found; branch pushed but PR not created')
-
-# checkout back to main
-subprocess.run(['git','checkout','main'])
+# Git: queue the snapshot for the next batched site commit instead of a
+# branch + push per snapshot (which also switched branches under running jobs)
+sys.path.insert(0, str(ROOT))
+import publish
+publish.enqueue(f'status snapshot {out.name}', paths=[str(out.relative_to(ROOT))])
+publish.flush()
 print('snapshot done', out)
@@ -0,0 +1,206 @@
+"""
+Per-stage timings for the update jobs.
+
+Every job entry point runs inside run(job); the pipeline functions are
+wrapped in stage() / @timed. Each stage records its duration, item count,
+bytes read and error, and at the end of the run all records are written to
+the `metrics` table in joeclaw.db and summarised in a Prometheus text file
+(logs/metrics.prom, for node_exporter's textfile collector):
+
+  joeclaw_stage_duration_seconds{job,stage}   time spent in the stage in the
+                                              job's latest run (summed over
+                                              calls, e.g. parallel feeds)
+  joeclaw_stage_items / _bytes / _calls       same run, summed
+  joeclaw_stage_errors                        failed calls still in the table
+                                              (retention.py keeps 30 days)
+  joeclaw_run_timestamp_seconds{job}          start of the job's latest run
+
+Stages outside a run are timed but not stored, so instrumented functions
+cost next to nothing when called from benchmarks or other scripts.
+
+Usage:
+  @metrics.run('news')
+  def run_once(): ...
+
+  @metrics.timed('store_news')
+  def store_news(records):
+      metrics.annotate(items=len(records))
+
+  with metrics.stage('record_ticks'): ...
+"""
+import functools
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import db
+from artifacts import write_if_changed
+
+PROM_PATH = os.environ.get('JOECLAW_METRICS_PROM',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'metrics.prom'))
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_id TEXT NOT NULL,
+        job TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        started_at REAL NOT NULL,
+        duration REAL NOT NULL,
+        items INTEGER,
+        bytes INTEGER,
+        error TEXT,
+        detail TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS metrics_stage ON metrics (stage, job, id)",
+    "CREATE INDEX IF NOT EXISTS metrics_run ON metrics (run_id)",
+)
+INSERT_SQL = """
+    INSERT INTO metrics (run_id, job, stage, started_at, duration, items, bytes, error, detail)
+    VALUES (:run_id, :job, :stage, :started_at, :duration, :items, :bytes, :error, :detail)
+"""
+LATEST_RUNS_SQL = """
+    SELECT m.job, m.stage, SUM(m.duration), SUM(m.items), SUM(m.bytes), COUNT(*), MIN(m.started_at)
+    FROM metrics m
+    JOIN (SELECT run_id FROM metrics WHERE id IN (SELECT MAX(id) FROM metrics WHERE stage = 'run' GROUP BY job)) r
+      ON m.run_id = r.run_id
+    GROUP BY m.job, m.stage
+"""
+ERRORS_SQL = "SELECT job, stage, COUNT(*) FROM metrics WHERE error IS NOT NULL GROUP BY job, stage"
+
+_run = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+@contextmanager
+def stage(name, detail=None):
+    """Time the block; yields the record so callers can set items/bytes."""
+    rec = {'stage': name, 'started_at': time.time(), 'items': None, 'bytes': None, 'error': None, 'detail': detail}
+    stack = _stack()
+    stack.append(rec)
+    start = time.perf_counter()
+    try:
+        yield rec
+    except BaseException as e:
+        fail(e)
+        raise
+    finally:
+        rec['duration'] = time.perf_counter() - start
+        stack.pop()
+        current = _run
+        if current is not None:
+            with _lock:
+                current['records'].append(rec)
+
+
+def timed(name=None, items=None):
+    """Decorator form of stage(); `items(result)` sets the item count."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name or fn.__name__) as rec:
+                result = fn(*args, **kwargs)
+                if items is not None and result is not None and rec['items'] is None:
+                    rec['items'] = items(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def annotate(**fields):
+    """Set fields (items, bytes, detail) on the innermost stage of this thread."""
+    stack = _stack()
+    if stack:
+        stack[-1].update(fields)
+
+
+def add_bytes(n):
+    """Count n bytes read against every open stage of this thread."""
+    for rec in _stack():
+        rec['bytes'] = (rec['bytes'] or 0) + n
+
+
+def fail(exc):
+    """Mark the innermost stage as failed, e.g. for a caught and logged error."""
+    stack = _stack()
+    if stack and stack[-1]['error'] is None:
+        stack[-1]['error'] = f"{type(exc).__name__}: {exc}"[:500]
+
+
+@contextmanager
+def run(job):
+    """Collect the stages of one job run and flush them when it ends.
+
+    Nested runs (a job calling another job's entry point) are plain stages
+    of the outer run.
+    """
+    global _run
+    if _run is not None:
+        with stage(f"run:{job}"):
+            yield
+        return
+    _run = {'job': job, 'run_id': uuid.uuid4().hex[:16], 'records': []}
+    try:
+        with stage('run'):
+            yield
+    finally:
+        current, _run = _run, None
+        try:
+            flush(current)
+        except Exception as e:
+            print(f"Warning: could not write metrics for {job}: {e}")
+
+
+def flush(current, db_path=None, prom_path=None):
+    conn = db.connect(db_path)
+    try:
+        for sql in SCHEMA:
+            conn.execute(sql)
+        with db.transaction(conn):
+            conn.executemany(INSERT_SQL, [dict(rec, run_id=current['run_id'], job=current['job'])
+                                          for rec in current['records']])
+        write_if_changed(prom_path or PROM_PATH, prometheus_text(conn))
+    finally:
+        conn.close()
+
+
+def _labels(job, stage_name=None):
+    esc = lambda v: v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    if stage_name is None:
+        return f'{{job="{esc(job)}"}}'
+    return f'{{job="{esc(job)}",stage="{esc(stage_name)}"}}'
+
+
+def prometheus_text(conn):
+    latest = conn.execute(LATEST_RUNS_SQL).fetchall()
+    errors = conn.execute(ERRORS_SQL).fetchall()
+    series = {
+        'joeclaw_stage_duration_seconds': ('gauge', 'Seconds spent in the stage during the latest run.', 2),
+        'joeclaw_stage_items': ('gauge', 'Items handled by the stage during the latest run.', 3),
+        'joeclaw_stage_bytes': ('gauge', 'Bytes read by the stage during the latest run.', 4),
+        'joeclaw_stage_calls': ('gauge', 'Calls of the stage during the latest run.', 5),
+    }
+    lines = []
+    for metric, (kind, help_text, col) in series.items():
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        lines += [f"{metric}{_labels(row[0], row[1])} {row[col]}" for row in latest if row[col] is not None]
+    # a gauge, not a counter: retention deletes old rows, so the count can drop
+    lines += ["# HELP joeclaw_stage_errors Failed calls of the stage within the retained metrics window.",
+              "# TYPE joeclaw_stage_errors gauge"]
+    lines += [f"joeclaw_stage_errors{_labels(job, name)} {count}" for job, name, count in errors]
+    lines += ["# HELP joeclaw_run_timestamp_seconds Start time of the job's latest run.",
+              "# TYPE joeclaw_run_timestamp_seconds gauge"]
+    lines += [f"joeclaw_run_timestamp_seconds{_labels(row[0])} {row[6]:.3f}" for row in latest if row[1] == 'run']
+    return '\n'.join(lines) + '\n'
+
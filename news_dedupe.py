@@ -0,0 +1,137 @@
+"""
+Fingerprints and near-duplicate detection for news items.
+
+Exact duplicates: every article gets a `fingerprint`, its normalized URL
+(lowercased host, no www., fragment or tracking parameters, sorted query)
+or, for items without a link, a hash of the normalized title. The news
+table keeps a UNIQUE index on it, so re-fetching an article is a no-op.
+
+Near duplicates: the same story syndicated by several sources with
+slightly different titles. Titles are turned into character shingles; a
+MinHash signature of the shingles only places each title in the LSH band
+buckets, which find candidates in O(1). The index keeps the shingle sets,
+not the signatures, and a candidate counts as a duplicate when the exact
+Jaccard similarity of the two shingle sets reaches THRESHOLD (SHORT_THRESHOLD for short titles, where one
+changed character, e.g. "Q3" vs "Q4", moves the score a lot). Only items
+from different sources are matched: a feed never syndicates itself, so two
+similar titles from one source are two stories.
+
+Usage:
+  fp = fingerprint(item['link'], item['title'])
+  index = NearDuplicateIndex()
+  if index.find(title, source=name) is None: index.add(fp, title, source=name)
+"""
+import hashlib
+import re
+import unicodedata
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+TRACKING_PARAMS = {'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', 'ref_src', 'cmpid', 'ncid', 'guccounter'}
+NUM_PERM = 64
+BANDS = 16            # 16 bands x 4 rows: ~0.8 Jaccard is caught with high probability
+SHINGLE = 4
+THRESHOLD = 0.8
+SHORT_SHINGLES = 30   # titles with fewer shingles (about 33 characters) are "short"
+SHORT_THRESHOLD = 0.9
+_MERSENNE = (1 << 61) - 1
+# fixed coefficients so signatures are stable across runs and processes
+_PERMS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), 'big') % _MERSENNE | 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), 'big') % _MERSENNE)
+    for i in range(NUM_PERM)
+]
+
+
+def normalize_url(url):
+    url = (url or '').strip()
+    if not url:
+        return ''
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith('utm_') and k.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower() or 'http', host, path, urlencode(query), ''))
+
+
+def normalize_title(title):
+    text = unicodedata.normalize('NFKC', title or '').lower()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return ' '.join(text.split())
+
+
+def title_hash(title):
+    return hashlib.sha1(normalize_title(title).encode('utf-8')).hexdigest()
+
+
+def fingerprint(url, title):
+    key = normalize_url(url)
+    return key if key else 'title:' + title_hash(title)
+
+
+def shingles(text, k=SHINGLE):
+    text = normalize_title(text)
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def minhash(text, shingle_set=None):
+    shingle_set = shingles(text) if shingle_set is None else shingle_set
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big') for s in shingle_set]
+    if not hashes:
+        return None
+    return tuple(min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMS)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+class NearDuplicateIndex:
+    def __init__(self, threshold=THRESHOLD, bands=BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.keys = set()
+        self.shingles = {}
+        self.sources = {}
+        self.buckets = {}
+
+    def _band_keys(self, sig):
+        for b in range(self.bands):
+            yield (b, sig[b * self.rows:(b + 1) * self.rows])
+
+    def find(self, text, exclude=None, source=None):
+        """Return the key of a similar stored item from another source, or None."""
+        sh = shingles(text)
+        sig = minhash(text, sh)
+        if sig is None:
+            return None
+        threshold = self.threshold if len(sh) >= SHORT_SHINGLES else max(self.threshold, SHORT_THRESHOLD)
+        seen = set()
+        for band in self._band_keys(sig):
+            for key in self.buckets.get(band, ()):
+                if key in seen or key == exclude:
+                    continue
+                seen.add(key)
+                if source is not None and self.sources.get(key) == source:
+                    continue
+                if jaccard(sh, self.shingles[key]) >= threshold:
+                    return key
+        return None
+
+    def add(self, key, text, source=None):
+        sh = shingles(text)
+        sig = minhash(text, sh)
+        if sig is None or key in self.keys:
+            return
+        self.keys.add(key)
+        self.shingles[key] = sh
+        self.sources[key] = source
+        for band in self._band_keys(sig):
+            self.buckets.setdefault(band, []).append(key)
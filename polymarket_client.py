@@ -0,0 +1,134 @@
+"""
+Async client for the Polymarket Gamma API.
+
+All queries share one pooled keep-alive requests.Session; blocking calls are
+run on worker threads so asyncio can keep up to `concurrency` requests in
+flight. Each query is paginated with limit/offset until a short page comes
+back (or `max_pages` is hit), and 429/5xx responses are retried with
+exponential backoff, honouring Retry-After when the server sends one. A
+Retry-After longer than MAX_RETRY_DELAY fails the query instead, so a
+rate-limited query cannot stall a market run.
+
+Usage:
+  markets = asyncio.run(fetch_markets(["Fed rate cut", "Bitcoin price"]))
+"""
+import asyncio
+import random
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GAMMA_URL = 'https://gamma-api.polymarket.com'
+PAGE_SIZE = 100
+MAX_PAGES = 10
+CONCURRENCY = 8
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5   # seconds; doubles on every retry
+MAX_RETRY_DELAY = 30  # seconds; longer Retry-After answers fail the query
+TIMEOUT = 10
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class GammaError(Exception):
+    pass
+
+
+def make_session(pool_size=CONCURRENCY):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = 'JoeClawSite-Agent/1.0'
+    return session
+
+
+class GammaClient:
+    def __init__(self, base_url=GAMMA_URL, concurrency=CONCURRENCY, page_size=PAGE_SIZE,
+                 max_pages=MAX_PAGES, max_retries=MAX_RETRIES, backoff=BACKOFF_BASE, timeout=TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = make_session(concurrency)
+        self._sem = asyncio.Semaphore(concurrency)
+
+    def close(self):
+        self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def _retry_delay(self, attempt, resp=None):
+        if resp is not None:
+            try:
+                retry_after = float(resp.headers.get('Retry-After'))
+            except (TypeError, ValueError):
+                pass
+            else:
+                if retry_after > MAX_RETRY_DELAY:
+                    raise GammaError(f"HTTP {resp.status_code} with Retry-After {retry_after:g}s "
+                                     f"(more than {MAX_RETRY_DELAY}s); giving up")
+                return max(0.0, retry_after)
+        # full jitter keeps concurrent retries from re-synchronising
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    async def get_json(self, path, params):
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            resp = None
+            try:
+                async with self._sem:
+                    resp = await asyncio.to_thread(self.session.get, url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    raise GammaError(f"GET {url} failed: {e}") from e
+            else:
+                if resp.status_code == 200:
+                    return resp.json()
+                if resp.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise GammaError(f"GET {url} returned HTTP {resp.status_code}")
+            await asyncio.sleep(self._retry_delay(attempt, resp))
+
+    async def search(self, query, **filters):
+        """Return every active market matching query, following pagination."""
+        markets = []
+        for page in range(self.max_pages):
+            params = {'active': 'true', 'closed': 'false', 'limit': self.page_size,
+                      'offset': page * self.page_size, 'query': query}
+            params.update(filters)
+            batch = await self.get_json('/markets', params)
+            if not isinstance(batch, list):
+                raise GammaError(f"unexpected /markets payload for {query!r}: {type(batch).__name__}")
+            markets.extend(batch)
+            if len(batch) < self.page_size:
+                break
+        return markets
+
+
+async def fetch_markets(queries, **client_kwargs):
+    """Run all queries concurrently and return the unique markets found.
+
+    A failing query is reported and skipped so the other queries still
+    contribute their markets.
+    """
+    async with GammaClient(**client_kwargs) as client:
+        results = await asyncio.gather(*(client.search(q) for q in queries), return_exceptions=True)
+
+    seen = set()
+    markets = []
+    for query, result in zip(queries, results):
+        if isinstance(result, Exception):
+            print(f"Polymarket error for {query}: {result}")
+            continue
+        for m in result:
+            key = m.get('id') or m.get('question')
+            if key in seen:
+                continue
+            seen.add(key)
+            markets.append(m)
+    return markets
@@ -0,0 +1,116 @@
+"""
+Numeric price history for market_data symbols.
+
+Every update run appends one tick per symbol: (symbol, ts, price, change)
+with ts as integer epoch seconds and price/change as REAL. The table is a
+WITHOUT ROWID table clustered on (symbol, ts), so the primary key is the
+covering index: a range scan for one symbol reads consecutive pages and
+never touches a separate rowid b-tree.
+
+Usage:
+  record_ticks(conn, [{'symbol': 'NVDA', 'value': 188.5, 'change_pct': -0.79}])
+  query_range(conn, 'NVDA', start=now - 86400)
+  downsample(conn, 'NVDA', bucket=3600, start=now - 30 * 86400)
+"""
+import sqlite3
+import time
+
+import db as db_module
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS price_history (
+        symbol TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        price REAL NOT NULL,
+        change REAL,
+        PRIMARY KEY (symbol, ts)
+    ) WITHOUT ROWID
+"""
+
+
+def _connect(db):
+    if isinstance(db, sqlite3.Connection):
+        return db, False
+    return db_module.connect(db), True
+
+
+def ensure_schema(conn):
+    conn.execute(SCHEMA)
+
+
+def record_ticks(db, items, ts=None):
+    """Append one tick per item that carries 'symbol' and a numeric 'value'.
+
+    Items without numeric values are skipped. A second tick for the same
+    symbol within the same second replaces the first. Returns the number of
+    ticks written.
+    """
+    ts = int(ts if ts is not None else time.time())
+    rows = [
+        (item['symbol'], ts, float(item['value']), item.get('change_pct'))
+        for item in items
+        if item.get('symbol') and item.get('value') is not None
+    ]
+    conn, owned = _connect(db)
+    try:
+        ensure_schema(conn)
+        with db_module.transaction(conn):
+            conn.executemany(
+                "INSERT OR REPLACE INTO price_history (symbol, ts, price, change) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+    finally:
+        if owned:
+            conn.close()
+    return len(rows)
+
+
+def query_range(db, symbol, start=None, end=None):
+    """Return [(ts, price, change), ...] for symbol with start <= ts < end."""
+    conn, owned = _connect(db)
+    try:
+        ensure_schema(conn)
+        return conn.execute(
+            "SELECT ts, price, change FROM price_history WHERE symbol = ? AND ts >= ? AND ts < ? ORDER BY ts",
+            (symbol, start if start is not None else 0, end if end is not None else 2 ** 62),
+        ).fetchall()
+    finally:
+        if owned:
+            conn.close()
+
+
+def downsample(db, symbol, bucket, start=None, end=None):
+    """Aggregate ticks into fixed `bucket`-second windows.
+
+    Returns [(bucket_start, avg, low, high, count), ...] ordered by time,
+    computed inside SQLite over the clustered (symbol, ts) range.
+    """
+    bucket = int(bucket)
+    if bucket <= 0:
+        raise ValueError("bucket must be a positive number of seconds")
+    conn, owned = _connect(db)
+    try:
+        ensure_schema(conn)
+        return conn.execute(
+            """
+            SELECT (ts / :bucket) * :bucket AS b, AVG(price), MIN(price), MAX(price), COUNT(*)
+            FROM price_history
+            WHERE symbol = :symbol AND ts >= :start AND ts < :end
+            GROUP BY b ORDER BY b
+            """,
+            {'bucket': bucket, 'symbol': symbol,
+             'start': start if start is not None else 0, 'end': end if end is not None else 2 ** 62},
+        ).fetchall()
+    finally:
+        if owned:
+            conn.close()
+
+
+def symbols(db):
+    conn, owned = _connect(db)
+    try:
+        ensure_schema(conn)
+        return [r[0] for r in conn.execute("SELECT DISTINCT symbol FROM price_history ORDER BY symbol")]
+    finally:
+        if owned:
+            conn.close()
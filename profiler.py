@@ -0,0 +1,125 @@
+"""
+Opt-in sampling profiler for the job entry points.
+
+Set JOECLAW_PROFILE to profile runs:
+
+  JOECLAW_PROFILE=1      every run
+  JOECLAW_PROFILE=0.05   a random 5% of runs
+  (unset / 0)            off; profile() then costs one environment lookup
+
+While a run is profiled a background thread snapshots every thread's stack
+with sys._current_frames() every JOECLAW_PROFILE_INTERVAL ms (default 10)
+and counts identical stacks. Nothing is hooked into the interpreter, so the
+overhead is a few percent at most, and blocked time (network, SQLite
+locks) shows up as well as CPU time. At the end of the run the counts are
+written as collapsed stacks, one "thread;file:func;... count" line each, to
+logs/profiles/<job>-<timestamp>.collapsed, ready for flamegraph.pl or
+speedscope. Only the newest PROFILE_KEEP profiles younger than
+PROFILE_MAX_AGE_DAYS are kept.
+
+Usage:
+  @profiler.profile('news')
+  def run_once(): ...
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'profiles')
+DEFAULT_INTERVAL_MS = 10
+PROFILE_KEEP = 50
+PROFILE_MAX_AGE_DAYS = 14
+
+_active = None
+
+
+def sample_rate():
+    """Fraction of runs to profile, from JOECLAW_PROFILE (0 when unset or invalid)."""
+    try:
+        return min(max(float(os.environ.get('JOECLAW_PROFILE') or 0), 0.0), 1.0)
+    except ValueError:
+        return 0.0
+
+
+class Sampler(threading.Thread):
+    def __init__(self, interval):
+        super().__init__(name='profiler', daemon=True)
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name.replace(';', '_').replace(' ', '_') for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.counts[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def write_collapsed(counts, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+    os.replace(tmp, path)
+
+
+def prune(directory=PROFILE_DIR, keep=PROFILE_KEEP, max_age_days=PROFILE_MAX_AGE_DAYS, now=None):
+    """Delete profiles beyond the newest `keep` or older than max_age_days."""
+    try:
+        names = [n for n in os.listdir(directory) if n.endswith('.collapsed')]
+    except FileNotFoundError:
+        return []
+    paths = sorted((os.path.join(directory, n) for n in names), key=os.path.getmtime, reverse=True)
+    cutoff = (now if now is not None else time.time()) - max_age_days * 86400
+    removed = [p for i, p in enumerate(paths) if i >= keep or os.path.getmtime(p) < cutoff]
+    for p in removed:
+        os.remove(p)
+    return removed
+
+
+@contextmanager
+def profile(job):
+    """Sample the block for a JOECLAW_PROFILE share of runs; nested calls are no-ops."""
+    global _active
+    rate = sample_rate()
+    if _active is not None or rate <= 0 or random.random() >= rate:
+        yield None
+        return
+    try:
+        interval = float(os.environ.get('JOECLAW_PROFILE_INTERVAL') or DEFAULT_INTERVAL_MS) / 1000
+    except ValueError:
+        interval = DEFAULT_INTERVAL_MS / 1000
+    sampler = _active = Sampler(interval)
+    sampler.start()
+    try:
+        yield sampler
+    finally:
+        sampler.stop()
+        _active = None
+        path = os.path.join(PROFILE_DIR, f"{job}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.collapsed")
+        try:
+            write_collapsed(sampler.counts, path)
+            prune()
+            print(f"Profile written to {path} ({sampler.samples} samples every {interval * 1000:g} ms)")
+        except OSError as e:
+            print(f"Warning: could not write profile {path}: {e}")
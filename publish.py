@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Debounced git publishing of the generated site.
+
+Jobs no longer commit and push after every change. They call enqueue()
+with a short reason, and flush() makes one commit for everything queued
+once the queue has been quiet for DEBOUNCE seconds, or at the latest
+MAX_LATENCY seconds after the first queued change. Only the generated text
+artifacts in PUBLISH_PATHS (plus any extra paths a caller queues) are
+staged; joeclaw.db is no longer committed. A failed push is retried on the
+next flush, even if nothing new was committed.
+
+Queue state and the last report live in .cache/publish-queue.json; the
+commit and push hold the shared 'git' job lock.
+
+Usage:
+  publish.enqueue('market data')
+  publish.flush()                   # no-op until the debounce expires
+  python3 publish.py --status
+  python3 publish.py --force        # flush now
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import time
+from datetime import datetime
+
+import joblock
+import metrics
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+QUEUE_PATH = os.path.join(ROOT, '.cache', 'publish-queue.json')
+PUBLISH_PATHS = ('index.html', 'news_*.html', 'assets', 'public/api', 'public/news')
+DEBOUNCE = 5 * 60        # seconds without new changes before flushing
+MAX_LATENCY = 15 * 60    # seconds after the first queued change at most
+GIT_LOCK_WAIT = 120      # seconds to wait for another process's commit/push
+MAX_REASONS = 50
+
+
+def _load():
+    try:
+        with open(QUEUE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save(state):
+    os.makedirs(os.path.dirname(QUEUE_PATH), exist_ok=True)
+    tmp = f"{QUEUE_PATH}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, QUEUE_PATH)
+
+
+def enqueue(reason, paths=()):
+    """Queue a publish of PUBLISH_PATHS (and `paths`, relative to the repo)."""
+    now = time.time()
+    with joblock.lock('publish-queue', wait=10):
+        state = _load()
+        state.setdefault('first_queued', now)
+        state['last_queued'] = now
+        reasons = state.setdefault('reasons', [])
+        if reason not in reasons and len(reasons) < MAX_REASONS:
+            reasons.append(reason)
+        extra = state.setdefault('paths', [])
+        extra += [p for p in paths if p not in extra]
+        _save(state)
+
+
+def due(state, now=None):
+    """True once queued changes have settled, or a failed push should be retried."""
+    now = now if now is not None else time.time()
+    if state.get('first_queued') and (now - state['last_queued'] >= DEBOUNCE
+                                      or now - state['first_queued'] >= MAX_LATENCY):
+        return True
+    return bool(state.get('unpushed')) and now - state.get('last_attempt', 0) >= DEBOUNCE
+
+
+def _git(*args, check=True):
+    return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, check=check)
+
+
+@metrics.timed('publish')
+def flush(force=False, push=True):
+    """Commit and push queued changes if due; returns a report dict or None.
+
+    The report lists the commit, the files it changed, the queued reasons,
+    and whether the push succeeded.
+    """
+    with joblock.lock('publish-queue', wait=10):
+        state = _load()
+        if not (state.get('first_queued') or state.get('unpushed')) or not (force or due(state)):
+            return None
+        # take the batch; changes queued while we commit start a new one
+        _save({'unpushed': state.get('unpushed', False), 'last_attempt': time.time(),
+               'last_report': state.get('last_report')})
+
+    reasons = state.get('reasons', [])
+    report = {'time': datetime.now().isoformat(timespec='seconds'), 'reasons': reasons, 'commit': None,
+              'files': [], 'pushed': False,
+              'waited': round(time.time() - state['first_queued'], 1) if state.get('first_queued') else 0}
+    try:
+        with joblock.lock('git', wait=GIT_LOCK_WAIT):
+            paths = [os.path.relpath(p, ROOT) for pattern in list(PUBLISH_PATHS) + state.get('paths', [])
+                     for p in sorted(glob.glob(os.path.join(ROOT, pattern)))]
+            files = []
+            if paths:
+                _git('add', '--', *paths)
+                files = _git('diff', '--cached', '--name-only', '--', *paths).stdout.split()
+            if files:
+                summary = ', '.join(reasons) or 'generated files'
+                # commit only the published paths, whatever else happens to be staged
+                _git('commit', '-m', f"Site Auto-Update: {datetime.now().strftime('%Y-%m-%d %H:%M')} ({summary})",
+                     '--', *paths)
+                report['commit'] = _git('rev-parse', '--short', 'HEAD').stdout.strip()
+                report['files'] = files
+            if push and (files or state.get('unpushed')):
+                result = _git('push', check=False)
+                report['pushed'] = result.returncode == 0
+                if not report['pushed']:
+                    print(f"Warning: git push failed: {result.stderr.strip()}")
+    except (subprocess.CalledProcessError, joblock.JobBusy) as e:
+        metrics.fail(e)
+        print(f"Publish error: {getattr(e, 'stderr', None) or e}")
+        # put the batch back so the next flush retries it
+        for reason in reasons:
+            enqueue(reason, state.get('paths', []))
+        return None
+
+    metrics.annotate(items=len(report['files']))
+    with joblock.lock('publish-queue', wait=10):
+        current = _load()
+        current['unpushed'] = bool(push and (report['commit'] or state.get('unpushed')) and not report['pushed'])
+        current['last_report'] = report
+        _save(current)
+    if report['commit']:
+        print(f"Published {report['commit']}: {len(report['files'])} files "
+              f"({', '.join(reasons)}; queued {report['waited']:.0f}s){'' if report['pushed'] else ', not pushed'}")
+    else:
+        print("Nothing to publish." if not report['pushed'] else "Pushed earlier commits.")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Flush the publish queue.')
+    parser.add_argument('--force', action='store_true', help='flush now, ignoring the debounce')
+    parser.add_argument('--no-push', action='store_true', help='commit only')
+    parser.add_argument('--status', action='store_true', help='print the queue and the last report')
+    args = parser.parse_args(argv)
+    if args.status:
+        print(json.dumps(_load(), ensure_ascii=False, indent=2))
+        return
+    flush(force=args.force, push=not args.no_push)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Retention and compaction for joeclaw.db.
+
+Each table has a policy in POLICIES:
+
+  keep_latest N per key     drop all but the newest N rows (by id) of each key
+  max_age_days M            drop rows whose time column is older than M days
+  downsample_after_days D   price_history only: fold raw ticks older than D
+                            days into one row per symbol and BUCKET seconds
+                            (average price, last change), so charts keep
+                            their shape at a fraction of the rows
+
+Deletes run in batches of BATCH_ROWS, each in its own short BEGIN IMMEDIATE
+transaction, so the update jobs writing between batches never wait long.
+A run stops after TIME_BUDGET seconds and the next run picks up where it
+left off. Afterwards up to VACUUM_PAGES free pages are returned to the OS
+with incremental_vacuum, ANALYZE refreshes the planner statistics (bounded
+by analysis_limit) and the WAL is checkpointed.
+
+Incremental vacuum needs auto_vacuum=INCREMENTAL, which SQLite can only
+switch on with a full VACUUM; the first run does that once.
+
+Usage:
+  python3 retention.py              # apply the policies
+  python3 retention.py --dry-run    # count what would be removed
+  python3 retention.py --status     # table sizes and free pages
+"""
+import argparse
+import time
+
+import db
+import joblock
+import metrics
+
+BATCH_ROWS = 500
+TIME_BUDGET = 20       # seconds of deleting per run; the rest waits for the next run
+VACUUM_PAGES = 2048    # free pages released per run (8 MB at the default page size)
+ANALYSIS_LIMIT = 400   # rows sampled per index by ANALYZE
+
+POLICIES = (
+    # the unique (category, name) index keeps this at one row per market;
+    # this only catches databases that predate it
+    {'table': 'market_data', 'key': ('category', 'name'), 'keep_latest': 1},
+    {'table': 'news', 'key': ('category',), 'keep_latest': 5000,
+     'time_column': 'fetched_at', 'max_age_days': 365},
+    # hand-written; only bounded by count
+    {'table': 'notes', 'key': (), 'keep_latest': 1000},
+    {'table': 'metrics', 'time_column': 'started_at', 'epoch': True, 'max_age_days': 30},
+    {'table': 'price_history', 'downsample_after_days': 7, 'bucket': 3600, 'max_age_days': 400},
+)
+
+KEEP_LATEST_SQL = """
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER ({partition} ORDER BY id DESC) AS n FROM {table} {where}
+    ) WHERE n > ? LIMIT ?
+"""
+TICK_BUCKETS_SQL = """
+    SELECT (ts / :bucket) * :bucket AS b FROM price_history
+    WHERE symbol = :symbol AND ts < :cutoff
+    GROUP BY b HAVING COUNT(*) > 1 OR MIN(ts) != b
+    ORDER BY b LIMIT :limit
+"""
+# with a single max() aggregate, SQLite takes the bare `change` from the newest tick
+TICK_AGGREGATE_SQL = """
+    SELECT :symbol, (ts / :bucket) * :bucket AS b, AVG(price), change, MAX(ts) FROM price_history
+    WHERE symbol = :symbol AND ts >= :start AND ts < :end
+    GROUP BY b
+"""
+
+
+def _exists(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def _age_clause(policy):
+    if policy.get('epoch'):
+        return f"{policy['time_column']} < ?", time.time() - policy['max_age_days'] * 86400
+    return f"julianday({policy['time_column']}) < julianday('now', ?)", f"-{policy['max_age_days']} days"
+
+
+def _delete_ids(conn, table, select_sql, params, deadline, dry_run):
+    """Delete the ids returned by select_sql (which ends in LIMIT ?) batch by batch."""
+    if dry_run:
+        return conn.execute(f"SELECT COUNT(*) FROM ({select_sql})", (*params, -1)).fetchone()[0]
+    removed = 0
+    while time.monotonic() < deadline:
+        with db.transaction(conn):
+            ids = [r[0] for r in conn.execute(select_sql, (*params, BATCH_ROWS))]
+            if ids:
+                conn.execute(f"DELETE FROM {table} WHERE id IN ({','.join('?' * len(ids))})", ids)
+        removed += len(ids)
+        if len(ids) < BATCH_ROWS:
+            break
+    return removed
+
+
+def trim_latest(conn, policy, deadline, dry_run=False):
+    """Keep the newest policy['keep_latest'] rows of each key.
+
+    Rows that expire() removes are left out, so a dry run doesn't count
+    them twice.
+    """
+    key = policy['key']
+    partition = f"PARTITION BY {', '.join(key)}" if key else ''
+    where, params = '', ()
+    if 'max_age_days' in policy:
+        clause, arg = _age_clause(policy)
+        where, params = f"WHERE NOT COALESCE({clause}, 0)", (arg,)
+    sql = KEEP_LATEST_SQL.format(partition=partition, table=policy['table'], where=where)
+    return _delete_ids(conn, policy['table'], sql, (*params, policy['keep_latest']), deadline, dry_run)
+
+
+def expire(conn, policy, deadline, dry_run=False):
+    """Drop rows older than policy['max_age_days'], oldest first."""
+    clause, arg = _age_clause(policy)
+    sql = f"SELECT id FROM {policy['table']} WHERE {clause} ORDER BY id LIMIT ?"
+    return _delete_ids(conn, policy['table'], sql, (arg,), deadline, dry_run)
+
+
+def compact_ticks(conn, policy, deadline, dry_run=False):
+    """Expire and downsample price_history, one symbol and batch of buckets at a time.
+
+    Returns the number of tick rows removed. Buckets that already hold a
+    single row at the bucket start are left alone, so reruns are cheap.
+    """
+    bucket = policy['bucket']
+    now = int(time.time())
+    expire_before = now - policy['max_age_days'] * 86400
+    # only whole buckets are folded
+    fold_before = (now - policy['downsample_after_days'] * 86400) // bucket * bucket
+    symbols = [r[0] for r in conn.execute("SELECT DISTINCT symbol FROM price_history")]
+    removed = 0
+    for symbol in symbols:
+        if dry_run:
+            old = conn.execute("SELECT COUNT(*) FROM price_history WHERE symbol = ? AND ts < ?",
+                               (symbol, expire_before)).fetchone()[0]
+            raw, folded = conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT ts / :bucket) FROM price_history "
+                "WHERE symbol = :symbol AND ts >= :start AND ts < :end",
+                {'bucket': bucket, 'symbol': symbol, 'start': expire_before, 'end': fold_before}).fetchone()
+            removed += old + raw - folded
+            continue
+        while time.monotonic() < deadline:
+            with db.transaction(conn):
+                ts = [r[0] for r in conn.execute(
+                    "SELECT ts FROM price_history WHERE symbol = ? AND ts < ? ORDER BY ts LIMIT ?",
+                    (symbol, expire_before, BATCH_ROWS))]
+                if ts:
+                    conn.execute("DELETE FROM price_history WHERE symbol = ? AND ts <= ?", (symbol, ts[-1]))
+            removed += len(ts)
+            if len(ts) < BATCH_ROWS:
+                break
+        while time.monotonic() < deadline:
+            buckets = [r[0] for r in conn.execute(TICK_BUCKETS_SQL, {
+                'bucket': bucket, 'symbol': symbol, 'cutoff': fold_before, 'limit': 24})]
+            if not buckets:
+                break
+            span = {'bucket': bucket, 'symbol': symbol, 'start': buckets[0], 'end': buckets[-1] + bucket}
+            with db.transaction(conn):
+                rows = [r[:4] for r in conn.execute(TICK_AGGREGATE_SQL, span)]
+                before = conn.total_changes
+                conn.execute("DELETE FROM price_history WHERE symbol = :symbol AND ts >= :start AND ts < :end", span)
+                removed += conn.total_changes - before - len(rows)
+                conn.executemany("INSERT INTO price_history (symbol, ts, price, change) VALUES (?, ?, ?, ?)", rows)
+    return removed
+
+
+def apply_policy(conn, policy, deadline, dry_run=False):
+    if policy['table'] == 'price_history':
+        return compact_ticks(conn, policy, deadline, dry_run)
+    removed = 0
+    if 'max_age_days' in policy:
+        removed += expire(conn, policy, deadline, dry_run)
+    if 'keep_latest' in policy:
+        removed += trim_latest(conn, policy, deadline, dry_run)
+    return removed
+
+
+def compact(conn, pages=VACUUM_PAGES):
+    """Release free pages, refresh statistics and checkpoint; returns pages released."""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        print("Switching joeclaw.db to auto_vacuum=INCREMENTAL (one-off full VACUUM)...")
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+    free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    # each step frees one page; executescript steps the pragma to completion
+    conn.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+    released = free - conn.execute('PRAGMA freelist_count').fetchone()[0]
+    conn.execute(f'PRAGMA analysis_limit={ANALYSIS_LIMIT}')
+    conn.execute('ANALYZE')
+    conn.commit()
+    db.checkpoint(conn)
+    return released
+
+
+@joblock.exclusive('retention')
+@metrics.run('retention')
+def run(db_path=None, dry_run=False, budget=TIME_BUDGET):
+    """Apply every policy within `budget` seconds, then compact; returns {table: rows removed}."""
+    conn = db.connect(db_path)
+    report = {}
+    try:
+        deadline = time.monotonic() + budget
+        for policy in POLICIES:
+            table = policy['table']
+            if not _exists(conn, table):
+                continue
+            with metrics.stage('retention', detail=table):
+                report[table] = apply_policy(conn, policy, deadline, dry_run)
+                metrics.annotate(items=report[table])
+        verb = 'would remove' if dry_run else 'removed'
+        print(f"Retention {verb}: " + ', '.join(f"{t} {n}" for t, n in report.items()))
+        if time.monotonic() >= deadline:
+            print("Retention stopped at its time budget; the next run continues.")
+        if not dry_run:
+            with metrics.stage('compact'):
+                released = compact(conn)
+                metrics.annotate(items=released)
+            print(f"Compacted: released {released} free pages.")
+    finally:
+        conn.close()
+    return report
+
+
+def status(db_path=None):
+    conn = db.connect(db_path, readonly=True)
+    try:
+        lines = []
+        for policy in POLICIES:
+            if _exists(conn, policy['table']):
+                count = conn.execute(f"SELECT COUNT(*) FROM {policy['table']}").fetchone()[0]
+                lines.append(f"{policy['table']:<14}{count:>10} rows")
+        page_size, pages, free, mode = (conn.execute(f'PRAGMA {p}').fetchone()[0]
+                                        for p in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum'))
+        lines.append(f"{pages * page_size / 1e6:.1f} MB in {pages} pages, {free} free, "
+                     f"auto_vacuum={('none', 'full', 'incremental')[mode]}")
+        return '\n'.join(lines)
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apply the joeclaw.db retention policies.')
+    parser.add_argument('--dry-run', action='store_true', help='count what would be removed, change nothing')
+    parser.add_argument('--status', action='store_true', help='print table sizes and free pages')
+    parser.add_argument('--budget', type=float, default=TIME_BUDGET, help='seconds of deleting (default: %(default)s)')
+    args = parser.parse_args(argv)
+    if args.status:
+        print(status())
+        return
+    run(dry_run=args.dry_run, budget=args.budget)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Resident scheduler for the JoeClawSite update jobs.
+
+Replaces one-interpreter-per-cron-tick: the job modules (and yfinance,
+pandas, requests, ...) are imported once, then every job runs in this
+process on its own interval with random jitter. Jobs run one at a time in
+the main thread, so they never race each other on joeclaw.db or index.html.
+
+After every run the job status table is written to STATUS_PATH; print it
+with `python3 scheduler.py --status`.
+
+Usage:
+  python3 scheduler.py            # run forever
+  python3 scheduler.py --once news
+  python3 scheduler.py --status
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import threading
+import time
+import traceback
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATUS_PATH = os.path.join(ROOT, 'logs', 'scheduler-status.json')
+IDLE_SLEEP_MAX = 60  # re-check the job table at least this often
+
+
+def run_market():
+    import update_market_data
+    update_market_data.main()
+
+
+def market_wake(ts):
+    """Earliest time at or after ts when a market session is open."""
+    if os.getenv("MANUAL_RUN") == "1":
+        return ts
+    import trading_calendar
+    from update_market_data import MARKETS
+    return trading_calendar.next_any_open_ts(MARKETS, ts)
+
+
+def run_news():
+    import update_news
+    update_news.run_once()
+
+
+def run_promotions():
+    import update_promotions
+    update_promotions.main(regenerate_html=False)
+
+
+def run_publish():
+    import publish
+    publish.flush()
+
+
+def run_retention():
+    import retention
+    retention.run()
+
+
+def run_html():
+    import metrics
+    import update_html
+    with metrics.run('html'):
+        update_html.generate_html()
+
+
+class Job:
+    def __init__(self, name, fn, interval, jitter=0.0, wake=None):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.jitter = jitter
+        # wake(ts) -> earliest time >= ts at which the job can have work to do
+        self.wake = wake
+        self.next_run = self._snooze(time.time() + random.uniform(0, jitter))
+        self.last_start = None
+        self.last_duration = None
+        self.last_status = 'pending'
+        self.last_error = None
+        self.runs = 0
+        self.failures = 0
+
+    def run(self):
+        self.last_start = time.time()
+        try:
+            self.fn()
+            self.last_status = 'ok'
+            self.last_error = None
+        except Exception as e:
+            self.failures += 1
+            self.last_status = 'error'
+            self.last_error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        finally:
+            self.runs += 1
+            self.last_duration = time.time() - self.last_start
+            # schedule from the start time so a slow run doesn't push every later run back
+            self.next_run = self._snooze(max(time.time(), self.last_start + self.interval) + random.uniform(0, self.jitter))
+
+    def _snooze(self, ts):
+        if self.wake is None:
+            return ts
+        try:
+            return max(ts, self.wake(ts))
+        except Exception as e:
+            print(f"Warning: {self.name} wake hook failed: {e}")
+            return ts
+
+    def status(self):
+        return {
+            'job': self.name,
+            'interval': self.interval,
+            'last_status': self.last_status,
+            'last_start': self.last_start,
+            'last_duration': round(self.last_duration, 3) if self.last_duration is not None else None,
+            'next_run': self.next_run,
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_error': self.last_error,
+        }
+
+
+# name -> (function, interval seconds, jitter seconds[, wake hook])
+JOBS = {
+    # sleeps straight through to the next TW/US session instead of polling
+    'market': (run_market, 30, 5, market_wake),
+    'news': (run_news, 30 * 60, 120),
+    'promotions': (run_promotions, 6 * 60 * 60, 300),
+    'html': (run_html, 15 * 60, 30),
+    # commits whatever the other jobs queued once it has settled (see publish.py)
+    'publish': (run_publish, 60, 5),
+    # trims and compacts joeclaw.db in small batches (see retention.py)
+    'retention': (run_retention, 6 * 60 * 60, 600),
+}
+
+
+class Scheduler:
+    def __init__(self, jobs, status_path=STATUS_PATH):
+        self.jobs = jobs
+        self.status_path = status_path
+        self._stop = threading.Event()
+
+    @property
+    def stopping(self):
+        return self._stop.is_set()
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def write_status(self):
+        os.makedirs(os.path.dirname(self.status_path), exist_ok=True)
+        tmp = self.status_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'pid': os.getpid(), 'updated': time.time(), 'jobs': [j.status() for j in self.jobs]}, f, indent=2)
+        os.replace(tmp, self.status_path)
+
+    def run_due(self, now=None):
+        now = time.time() if now is None else now
+        ran = 0
+        for job in sorted(self.jobs, key=lambda j: j.next_run):
+            if self.stopping or job.next_run > now:
+                continue
+            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] scheduler: running {job.name}")
+            job.run()
+            ran += 1
+            self.write_status()
+        return ran
+
+    def run_forever(self):
+        self.write_status()
+        while not self.stopping:
+            self.run_due()
+            wait = min(j.next_run for j in self.jobs) - time.time()
+            if wait > 0:
+                self._stop.wait(min(wait, IDLE_SLEEP_MAX))
+        self.write_status()
+
+
+def format_status(path=STATUS_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return 'scheduler has not written a status file yet'
+
+    def ts(v):
+        return datetime.fromtimestamp(v).strftime('%Y-%m-%d %H:%M:%S') if v else '-'
+
+    lines = [f"pid {data.get('pid')}  updated {ts(data.get('updated'))}",
+             f"{'job':<12}{'status':<9}{'last start':<21}{'took(s)':>8}  {'next run':<21}{'runs':>5}{'fail':>5}  error"]
+    for j in data.get('jobs', []):
+        took = '-' if j['last_duration'] is None else f"{j['last_duration']:.2f}"
+        lines.append(f"{j['job']:<12}{j['last_status']:<9}{ts(j['last_start']):<21}{took:>8}  {ts(j['next_run']):<21}"
+                     f"{j['runs']:>5}{j['failures']:>5}  {j['last_error'] or ''}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--once', choices=sorted(JOBS), help='run a single job now and exit')
+    parser.add_argument('--status', action='store_true', help='print the job status table and exit')
+    parser.add_argument('--only', nargs='+', choices=sorted(JOBS), help='schedule only these jobs')
+    args = parser.parse_args()
+
+    if args.status:
+        print(format_status())
+        return
+
+    # the job modules use paths relative to the workspace
+    os.chdir(ROOT)
+    if args.once:
+        job = Job(args.once, *JOBS[args.once][:3])
+        job.run()
+        raise SystemExit(0 if job.last_status == 'ok' else 1)
+
+    names = args.only or list(JOBS)
+    scheduler = Scheduler([Job(n, *JOBS[n]) for n in names])
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    print(f"scheduler started (pid {os.getpid()}): {', '.join(names)}")
+    scheduler.run_forever()
+    print("scheduler stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+function updateClock() {
+    document.getElementById('clock').innerText = new Date().toLocaleString('zh-TW');
+}
+setInterval(updateClock, 1000);
+updateClock();
+
+// Data comes from static snapshots written by update_html.generate_html();
+// the browser revalidates them with ETag/Last-Modified (cache: 'no-cache'),
+// so an unchanged snapshot costs a 304 and nothing is re-rendered.
+const API_BASE = 'public/api/';
+const POLL_MS = 60000;
+const snapshotHashes = Object.assign({}, typeof SNAPSHOT_HASHES === 'undefined' ? {} : SNAPSHOT_HASHES);
+const snapshots = {};
+
+function esc(value) {
+    return String(value == null ? '' : value)
+        .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;').replace(/'/g, '&#x27;');
+}
+
+function safeUrl(url) {
+    url = String(url || '').trim();
+    return (/^[a-z][a-z0-9+.-]*:/i.test(url) && !/^(https?:|mailto:)/i.test(url)) ? '' : url;
+}
+
+async function loadSnapshot(name) {
+    const resp = await fetch(`${API_BASE}${name}.json`, { cache: 'no-cache' });
+    if (!resp.ok) throw new Error(`${name}.json: HTTP ${resp.status}`);
+    const snap = await resp.json();
+    const changed = snapshotHashes[name] !== snap.hash;
+    snapshotHashes[name] = snap.hash;
+    snapshots[name] = snap;
+    return changed;
+}
+
+function renderMarketCards(snap) {
+    return snap.data.categories.map(cat => `
+<section class="card">
+    <h2>${esc(cat.name)} ${esc(cat.note)} <span>${esc(cat.icon)}</span></h2>
+    <div class="market-list">
+        ${cat.items.map(item => `
+        <div class="market-item">
+            <div class="asset-info">
+                <span class="asset-name">${esc(item.name)}</span>
+                <span class="asset-price">${esc(item.price)}</span>
+            </div>
+            <span class="asset-change ${(item.change || '').includes('+') ? 'change-up' : 'change-down'}">${esc(item.change)}</span>
+        </div>`).join('')}
+    </div>
+</section>`).join('');
+}
+
+function renderNewsSections(snap) {
+    return snap.data.sections.map(section => `
+    <section class="card">
+        <h2>${esc(section.title)} <span>📰</span></h2>
+        <div class="market-list">${section.items.map(item => `
+        <div class="market-item">
+            <div class="asset-info">
+                <span class="asset-name">${esc(item.title)}</span>
+                <span class="asset-price">${esc(item.source)}</span>
+            </div>
+            <div style="width:100%;margin-top:0.5rem;">${esc(item.summary)} <a href="${esc(safeUrl(item.link))}" target="_blank">（原文）</a></div>
+        </div>`).join('')}</div>
+        <div style="margin-top:0.5rem;">直接顯示分類內容</div>
+    </section>`).join('');
+}
+
+function renderPromotions(items) {
+    const list = document.getElementById('promo-list');
+    if (!list) return;
+    list.innerHTML = items.map(deal => `
+        <div class="market-item" style="cursor:pointer" data-url="${esc(safeUrl(deal.url))}">
+            <div class="asset-info">
+                <span class="asset-name">${esc(deal.platform)}: ${esc(deal.name)}</span>
+                <span class="asset-price" style="text-decoration: line-through; font-size: 0.8rem;">${esc(deal.original)}</span>
+            </div>
+            <span class="asset-change change-up">${esc(deal.price)}</span>
+        </div>`).join('');
+    list.querySelectorAll('[data-url]').forEach(el => {
+        el.onclick = () => el.dataset.url && window.open(el.dataset.url, '_blank');
+    });
+}
+
+async function refreshAll() {
+    const dot = document.getElementById('sync-dot');
+    const status = document.getElementById('sync-status');
+    const source = document.getElementById('data-source');
+
+    dot.className = 'sync-dot';
+    const names = ['market', 'news', 'promotions'];
+    const results = await Promise.allSettled(names.map(loadSnapshot));
+    const changed = {};
+    names.forEach((name, i) => { changed[name] = results[i].status === 'fulfilled' && results[i].value; });
+    results.filter(r => r.status === 'rejected').forEach(r => console.error('Snapshot refresh failed:', r.reason));
+
+    if ((changed.market || changed.news) && snapshots.market && snapshots.news) {
+        document.querySelector('main').innerHTML = renderMarketCards(snapshots.market) + renderNewsSections(snapshots.news);
+    }
+    if (changed.promotions && snapshots.promotions) {
+        renderPromotions(snapshots.promotions.data.items);
+    }
+
+    const stamps = Object.values(snapshots).map(s => s.generated_at).sort();
+    if (stamps.length) {
+        status.innerText = `SYSTEM LIVE — 最後更新: ${stamps[stamps.length - 1]}`;
+        dot.className = 'sync-dot live';
+        source.innerText = 'joeclaw.db snapshot';
+    } else {
+        status.innerText = '（暫時無法取得最新資料，顯示快取頁面）';
+    }
+}
+
+renderPromotions(typeof deals === 'undefined' ? [] : deals);
+const refreshBtn = document.getElementById('refresh-btn');
+if (refreshBtn) refreshBtn.addEventListener('click', refreshAll);
+
+// Initial check, then poll the snapshots
+refreshAll();
+setInterval(refreshAll, POLL_MS);
+
+console.log('JoeClaw Dashboard Multi-page initialized.');
@@ -0,0 +1,98 @@
+"""
+Minimal compiled template engine for the site generator.
+
+A template is compiled once into a list of literal segments and
+placeholders; render() fills the placeholders and joins the list, so
+building a page costs one str.join instead of repeated `+=` copies.
+
+Placeholders use `{{ name }}` or `{{ name|filter }}`. Values are
+HTML-escaped unless they are Markup (e.g. the output of another template)
+or the `raw` filter is used.
+
+Filters:
+  raw   insert as-is
+  url   escape, and drop anything that is not http(s), mailto or relative
+  json  JSON literal safe to embed inside <script>
+
+Usage:
+  ITEM = Template('<li title="{{ name }}">{{ name }}</li>')
+  html = ITEM.render_each([{'name': 'a & b'}])
+"""
+import html
+import json
+import re
+
+PLACEHOLDER = re.compile(r'\{\{\s*(\w+)(?:\|(\w+))?\s*\}\}')
+SAFE_SCHEMES = ('http://', 'https://', 'mailto:')
+
+
+class Markup(str):
+    """A str that is already safe HTML and is inserted without escaping."""
+
+
+def escape(value):
+    if isinstance(value, Markup):
+        return value
+    if value is None:
+        return Markup('')
+    return Markup(html.escape(str(value), quote=True))
+
+
+def safe_url(value):
+    """Return value as a URL string, or '' for javascript:, data: and friends."""
+    text = '' if value is None else str(value).strip()
+    if ':' in text.split('/', 1)[0] and not text.lower().startswith(SAFE_SCHEMES):
+        return ''
+    return text
+
+
+def _url(value):
+    return escape(safe_url(value))
+
+
+def _json(value):
+    text = json.dumps(value, ensure_ascii=False)
+    # keep "</script>" and HTML comments from terminating the surrounding block
+    return Markup(text.replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026'))
+
+
+FILTERS = {
+    None: escape,
+    'raw': lambda v: Markup('' if v is None else str(v)),
+    'url': _url,
+    'json': _json,
+}
+
+
+class Template:
+    def __init__(self, source):
+        self.source = source
+        # even indexes: literal text, odd indexes: (name, filter) placeholders
+        self.segments = []
+        self.slots = []
+        pos = 0
+        for m in PLACEHOLDER.finditer(source):
+            name, filt = m.group(1), m.group(2)
+            if filt not in FILTERS:
+                raise ValueError(f"unknown template filter {filt!r} in {{{{ {name}|{filt} }}}}")
+            self.segments.append(source[pos:m.start()])
+            self.slots.append((len(self.segments), name, FILTERS[filt]))
+            self.segments.append(None)
+            pos = m.end()
+        self.segments.append(source[pos:])
+
+    def render(self, context=None, **kwargs):
+        if context is None:
+            context = kwargs
+        elif kwargs:
+            context = {**context, **kwargs}
+        parts = list(self.segments)
+        for idx, name, filt in self.slots:
+            try:
+                parts[idx] = filt(context[name])
+            except KeyError:
+                raise KeyError(f"template variable {name!r} not provided") from None
+        return Markup(''.join(parts))
+
+    def render_each(self, rows):
+        return Markup(''.join(self.render(row) for row in rows))
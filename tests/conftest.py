@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the flat job modules and the shared benchmark fixtures
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
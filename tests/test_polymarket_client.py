@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+import polymarket_client
+from fixtures import FakeGamma
+
+
+@pytest.fixture
+def gamma():
+    fake = FakeGamma(per_query=250)
+    yield fake
+    fake.close()
+
+
+def fetch(gamma, queries, **kwargs):
+    kwargs.setdefault('backoff', 0)
+    return asyncio.run(polymarket_client.fetch_markets(queries, base_url=gamma.url, **kwargs))
+
+
+def test_follows_pagination_until_a_short_page(gamma):
+    markets = fetch(gamma, ['fed'])
+    assert len(markets) == 250
+    assert len({m['id'] for m in markets}) == 250
+    assert [offset for _, offset in gamma.requests] == [0, 100, 200]
+
+
+def test_stops_at_max_pages(gamma):
+    assert len(fetch(gamma, ['fed'], max_pages=2)) == 200
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record the retry delays instead of sleeping."""
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+    monkeypatch.setattr(polymarket_client.asyncio, 'sleep', fake_sleep)
+    return delays
+
+
+def test_retries_429_and_honours_retry_after(gamma, sleeps):
+    gamma.errors['fed'] = [(429, {'Retry-After': '7'}), (503, {})]
+    markets = fetch(gamma, ['fed'])
+    assert len(markets) == 250
+    assert gamma.requests[:3] == [('fed', 0)] * 3
+    # the server's delay is used as-is, not capped by our own backoff
+    assert sleeps == [7.0, 0.0]
+
+
+def test_retry_after_beyond_the_limit_fails_the_query(gamma, sleeps, capsys):
+    gamma.errors['fed'] = [(429, {'Retry-After': '3600'})]
+    markets = fetch(gamma, ['fed', 'btc'])
+    assert {m['id'].split('-')[0] for m in markets} == {'btc'}
+    assert [r for r in gamma.requests if r[0] == 'fed'] == [('fed', 0)]
+    assert sleeps == []
+    assert 'Retry-After 3600s' in capsys.readouterr().out
+
+
+def test_failing_query_does_not_sink_the_others(gamma, capsys):
+    gamma.errors['broken'] = [(500, {})] * 3
+    markets = fetch(gamma, ['fed', 'broken', 'btc'], max_retries=2)
+    assert {m['id'].split('-')[0] for m in markets} == {'fed', 'btc'}
+    assert len(markets) == 500
+    assert 'Polymarket error for broken' in capsys.readouterr().out
+
+
+def test_non_retryable_status_fails_fast(gamma):
+    gamma.errors['missing'] = [(404, {})]
+    assert fetch(gamma, ['missing']) == []
+    assert gamma.requests == [('missing', 0)]
@@ -0,0 +1,89 @@
+import os
+import subprocess
+
+import pytest
+
+import joblock
+import publish
+
+
+def git(cwd, *args):
+    return subprocess.run(['git', *args], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """A working tree with a local bare repo as origin, wired into publish."""
+    remote = tmp_path / 'remote.git'
+    work = tmp_path / 'site'
+    git(tmp_path, 'init', '-q', '--bare', str(remote))
+    git(tmp_path, 'init', '-q', str(work))
+    for key, value in (('user.name', 'test'), ('user.email', 'test@example.com'), ('commit.gpgsign', 'false')):
+        git(work, 'config', key, value)
+    (work / 'index.html').write_text('v0')
+    (work / 'notes.txt').write_text('not published')
+    git(work, 'add', 'index.html')
+    git(work, 'commit', '-q', '-m', 'initial')
+    git(work, 'remote', 'add', 'origin', str(remote))
+    git(work, 'push', '-q', '-u', 'origin', 'HEAD')
+    monkeypatch.setattr(publish, 'ROOT', str(work))
+    monkeypatch.setattr(publish, 'QUEUE_PATH', str(work / '.cache' / 'publish-queue.json'))
+    monkeypatch.setattr(joblock, 'LOCK_DIR', str(tmp_path / 'locks'))
+    return work, remote
+
+
+def commits(repo):
+    return int(git(repo, 'rev-list', '--count', '--all'))
+
+
+def test_flush_waits_for_the_debounce(site):
+    work, _ = site
+    (work / 'index.html').write_text('v1')
+    publish.enqueue('market data')
+    assert publish.flush() is None
+    assert commits(work) == 1
+
+    state = publish._load()
+    assert not publish.due(state, now=state['last_queued'] + publish.DEBOUNCE - 1)
+    assert publish.due(state, now=state['last_queued'] + publish.DEBOUNCE)
+    assert publish.due(state, now=state['first_queued'] + publish.MAX_LATENCY)
+
+
+def test_one_commit_per_batch(site, monkeypatch):
+    work, remote = site
+    monkeypatch.setattr(publish, 'DEBOUNCE', 0)
+    (work / 'index.html').write_text('v1')
+    publish.enqueue('market data')
+    os.makedirs(work / 'public' / 'api')
+    (work / 'public' / 'api' / 'market.json').write_text('{}')
+    (work / 'notes.txt').write_text('changed, but never published')
+    publish.enqueue('html')
+
+    report = publish.flush()
+    assert report['pushed'] and report['reasons'] == ['market data', 'html']
+    assert sorted(report['files']) == ['index.html', 'public/api/market.json']
+    assert commits(work) == 2
+    assert git(remote, 'rev-parse', 'HEAD') == git(work, 'rev-parse', 'HEAD')
+    assert 'notes.txt' not in git(work, 'show', '--name-only', '--format=', 'HEAD')
+
+    # the queue is empty again, so the next flush has nothing to do
+    assert publish.flush() is None
+    assert commits(work) == 2
+
+
+def test_failed_push_is_retried_on_the_next_flush(site, monkeypatch):
+    work, remote = site
+    monkeypatch.setattr(publish, 'DEBOUNCE', 0)
+    git(work, 'remote', 'set-url', 'origin', str(work.parent / 'missing.git'))
+    (work / 'index.html').write_text('v1')
+    publish.enqueue('market data')
+
+    report = publish.flush()
+    assert report['commit'] and not report['pushed']
+    assert publish._load()['unpushed'] is True
+
+    git(work, 'remote', 'set-url', 'origin', str(remote))
+    retry = publish.flush()
+    assert retry['pushed'] and retry['commit'] is None
+    assert git(remote, 'rev-parse', 'HEAD') == git(work, 'rev-parse', 'HEAD')
+    assert publish._load()['unpushed'] is False
@@ -0,0 +1,125 @@
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import db
+import joblock
+import metrics
+import price_history
+import retention
+
+HOUR = 3600
+DAY = 86400
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """A joeclaw.db-shaped temp database; metrics and locks stay in tmp_path too."""
+    path = str(tmp_path / 'joeclaw.db')
+    monkeypatch.setattr(db, 'DB_PATH', path)
+    monkeypatch.setattr(metrics, 'PROM_PATH', str(tmp_path / 'metrics.prom'))
+    monkeypatch.setattr(joblock, 'LOCK_DIR', str(tmp_path / 'locks'))
+    # small per-key limits so a handful of rows exercises them
+    policies = [dict(p) for p in retention.POLICIES]
+    for p in policies:
+        if p['table'] == 'news':
+            p['keep_latest'] = 3
+        if p['table'] == 'notes':
+            p['keep_latest'] = 2
+    monkeypatch.setattr(retention, 'POLICIES', tuple(policies))
+    monkeypatch.setattr(retention, 'BATCH_ROWS', 7)  # force several batches
+
+    now = time.time()
+    stamp = lambda days: (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("CREATE TABLE market_data (id INTEGER PRIMARY KEY AUTOINCREMENT, category TEXT NOT NULL, "
+                     "name TEXT NOT NULL, price TEXT NOT NULL, change TEXT NOT NULL)")
+        conn.executemany("INSERT INTO market_data (category, name, price, change) VALUES (?, ?, ?, '0%')",
+                         [('US Stocks', f'SYM{i % 4}', str(i)) for i in range(20)])
+        conn.execute("CREATE TABLE news (id INTEGER PRIMARY KEY AUTOINCREMENT, category TEXT, title TEXT, fetched_at TEXT)")
+        conn.executemany("INSERT INTO news (category, title, fetched_at) VALUES (?, ?, ?)",
+                         [('ai', f'old {i}', stamp(400)) for i in range(5)]
+                         + [(cat, f'{cat} {i}', stamp(1)) for cat in ('ai', 'health') for i in range(5)])
+        conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY AUTOINCREMENT, content TEXT, "
+                     "created_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
+        conn.executemany("INSERT INTO notes (content) VALUES (?)", [(f'note {i}',) for i in range(5)])
+        for sql in metrics.SCHEMA:
+            conn.execute(sql)
+        conn.executemany("INSERT INTO metrics (run_id, job, stage, started_at, duration) VALUES ('r', 'news', 'run', ?, 1)",
+                         [(now - d * DAY,) for d in range(0, 60, 3)])
+        price_history.ensure_schema(conn)
+        hour = int(now) // HOUR * HOUR
+        conn.executemany("INSERT INTO price_history (symbol, ts, price, change) VALUES (?, ?, ?, ?)",
+                         [(s, ts, float(ts % 1000), 0.0) for s in ('NVDA', 'TSM')
+                          for ts in list(range(hour - 450 * DAY, hour - 440 * DAY, 6 * HOUR))   # expired
+                          + list(range(hour - 12 * DAY, hour - 10 * DAY, 600))                  # folded hourly
+                          + list(range(hour - DAY, hour, 600))])                                # kept raw
+    conn.close()
+    return path
+
+
+def count(path, sql, *params):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql, params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_policies(db_path):
+    report = retention.run(db_path)
+
+    # keep latest N per key
+    assert count(db_path, "SELECT COUNT(*) FROM market_data") == 4
+    assert count(db_path, "SELECT MIN(id) FROM market_data") == 17
+    assert count(db_path, "SELECT group_concat(content) FROM notes") == 'note 3,note 4'
+    # max age (text timestamps), then latest N per category
+    assert count(db_path, "SELECT COUNT(*) FROM news WHERE title LIKE 'old%'") == 0
+    assert count(db_path, "SELECT COUNT(*) FROM news WHERE category = 'ai'") == 3
+    assert count(db_path, "SELECT COUNT(*) FROM news WHERE category = 'health'") == 3
+    # max age (epoch timestamps); the run's own metrics rows are new
+    assert count(db_path, "SELECT COUNT(*) FROM metrics WHERE started_at < ?", time.time() - 30 * DAY) == 0
+    assert count(db_path, "SELECT COUNT(*) FROM metrics WHERE job = 'news'") == 10
+    # price history: expired, folded to one row per hour, recent ticks untouched
+    old = time.time() - 400 * DAY
+    assert count(db_path, "SELECT COUNT(*) FROM price_history WHERE ts < ?", old) == 0
+    folded = time.time() - 7 * DAY
+    assert count(db_path, "SELECT COUNT(*) FROM price_history WHERE symbol = 'NVDA' AND ts < ?", folded) == 48
+    assert count(db_path, "SELECT COUNT(*) FROM price_history WHERE symbol = 'NVDA' AND ts % 3600 != 0 AND ts < ?",
+                 folded) == 0
+    assert count(db_path, "SELECT COUNT(*) FROM price_history WHERE symbol = 'NVDA' AND ts >= ?", folded) == 144
+
+    assert report == {'market_data': 16, 'news': 9, 'notes': 3, 'metrics': 10,
+                      'price_history': 2 * (40 + 288 - 48)}
+    assert count(db_path, "PRAGMA auto_vacuum") == 2
+
+
+def test_second_run_removes_nothing(db_path):
+    retention.run(db_path)
+    assert set(retention.run(db_path).values()) == {0}
+
+
+def test_dry_run_matches_a_real_run(db_path):
+    before = count(db_path, "SELECT COUNT(*) FROM price_history")
+    predicted = retention.run(db_path, dry_run=True)
+    assert count(db_path, "SELECT COUNT(*) FROM price_history") == before
+    assert retention.run(db_path) == predicted
+
+
+def test_stops_at_the_time_budget_and_resumes(db_path):
+    assert retention.run(db_path, budget=0) == {t: 0 for t in ('market_data', 'news', 'notes', 'metrics', 'price_history')}
+    assert retention.run(db_path)['price_history'] > 0
+
+
+def test_folded_bucket_keeps_the_newest_change(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'ticks.db'))
+    price_history.ensure_schema(conn)
+    # inserted out of order so the newest tick is not the last row written
+    conn.executemany("INSERT INTO price_history VALUES ('NVDA', ?, ?, ?)",
+                     [(7200 + 1800, 30.0, 3.0), (7200 + 60, 10.0, 1.0), (7200 + 3000, 20.0, 2.5), (7200 + 900, 40.0, 4.0)])
+    rows = [r[:4] for r in conn.execute(retention.TICK_AGGREGATE_SQL,
+                                        {'symbol': 'NVDA', 'bucket': HOUR, 'start': 0, 'end': 4 * HOUR})]
+    assert rows == [('NVDA', 7200, 25.0, 2.5)]
@@ -0,0 +1,46 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin'))
+import status_server  # noqa: E402
+import update_status  # noqa: E402
+
+
+def test_clean_update_coerces_field_types():
+    assert update_status.clean_update({'detail': 5, 'progress': '40', 'task': 'x', 'extra': 1}) == \
+        {'detail': '5', 'progress': 40.0, 'task': 'x'}
+
+
+@pytest.mark.parametrize('update', [{'progress': 'half'}, {'detail': {'a': 1}}, {'task': 'ok', 'step': [1]}])
+def test_bad_update_leaves_status_untouched(update):
+    status = update_status.default_status()
+    before = json.dumps(status)
+    with pytest.raises(ValueError):
+        update_status.apply_update(status, update)
+    assert json.dumps(status) == before
+
+
+def test_post_with_bad_types_gets_400(tmp_path):
+    server = status_server.StatusServer(status_path=str(tmp_path / 'status.json'), public_dir=str(tmp_path))
+    before = update_status.to_json(server.status)
+
+    async def post(body):
+        tcp = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        port = tcp.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f"POST /update HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        reply = await reader.read()
+        writer.close()
+        tcp.close()
+        await tcp.wait_closed()
+        return reply
+
+    reply = asyncio.run(post(b'{"task": "t", "progress": "half"}'))
+    assert reply.startswith(b'HTTP/1.1 400')
+    assert update_status.to_json(server.status) == before
+    assert not server.dirty
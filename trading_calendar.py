@@ -0,0 +1,134 @@
+"""
+Trading calendar shared by every job.
+
+For each exchange we precompute one year of sessions as two sorted lists of
+UTC epoch seconds (opens, closes), skipping weekends and exchange holidays.
+"Is it open?" and "when does it next open?" are then a bisect over those
+lists. Session tables are cached per (exchange, year) in memory; holiday
+calendars are cached per year on disk (.cache/holidays-<cal>-<year>.json)
+so the holidays package is imported at most once a year.
+
+Usage:
+  is_open('US')
+  any_open(('TW', 'US'))
+  next_open('JP')            # aware UTC datetime
+"""
+import json
+import os
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+HOLIDAY_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+# code -> (timezone, [(open, close), ...] local times, holiday calendar, extra closed (month, day) dates)
+EXCHANGES = {
+    'TW': ('Asia/Taipei', [(time(9, 0), time(13, 30))], 'TW', ()),
+    'US': ('America/New_York', [(time(9, 30), time(16, 0))], 'NYSE', ()),
+    # TSE: lunch break, and closed for the New Year holidays (Dec 31 - Jan 3)
+    'JP': ('Asia/Tokyo', [(time(9, 0), time(11, 30)), (time(12, 30), time(15, 30))], 'JP',
+           ((12, 31), (1, 1), (1, 2), (1, 3))),
+}
+
+
+@lru_cache(maxsize=None)
+def holiday_dates(calendar, year):
+    """Return the set of ISO holiday dates for a holidays calendar in year.
+
+    `calendar` is a country code ('TW', 'JP') or a financial market code
+    ('NYSE'). Computed with the holidays package once per year and persisted
+    under .cache/, so later runs answer from a small JSON file.
+    """
+    path = os.path.join(HOLIDAY_CACHE_DIR, f"holidays-{calendar}-{year}.json")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return frozenset(json.load(f))
+    except (FileNotFoundError, ValueError):
+        pass
+
+    import holidays
+    if calendar in holidays.list_supported_financial():
+        cal = holidays.financial_holidays(calendar, years=year)
+    else:
+        cal = holidays.country_holidays(calendar, years=year)
+    dates = sorted(d.isoformat() for d in cal)
+    try:
+        os.makedirs(HOLIDAY_CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(dates, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Warning: could not cache {calendar} holidays for {year}: {e}")
+    return frozenset(dates)
+
+
+@lru_cache(maxsize=None)
+def sessions(exchange, year):
+    """Return (opens, closes): sorted UTC epoch seconds of every session in year."""
+    tz_name, windows, calendar, extra_closed = EXCHANGES[exchange]
+    tz = ZoneInfo(tz_name)
+    closed = holiday_dates(calendar, year)
+    opens, closes = [], []
+    day = date(year, 1, 1)
+    while day.year == year:
+        if day.weekday() < 5 and day.isoformat() not in closed and (day.month, day.day) not in extra_closed:
+            for start, end in windows:
+                opens.append(datetime.combine(day, start, tz).timestamp())
+                closes.append(datetime.combine(day, end, tz).timestamp())
+        day += timedelta(days=1)
+    return opens, closes
+
+
+def _ts(when):
+    if when is None:
+        return datetime.now(timezone.utc).timestamp()
+    if isinstance(when, datetime):
+        if when.tzinfo is None:
+            raise ValueError("naive datetime; pass an aware datetime or epoch seconds")
+        return when.timestamp()
+    return float(when)
+
+
+def _local_year(exchange, ts):
+    return datetime.fromtimestamp(ts, ZoneInfo(EXCHANGES[exchange][0])).year
+
+
+def is_open(exchange, when=None):
+    """True if `exchange` is in a session at `when` (default now); close is inclusive."""
+    ts = _ts(when)
+    opens, closes = sessions(exchange, _local_year(exchange, ts))
+    i = bisect_right(opens, ts) - 1
+    return i >= 0 and ts <= closes[i]
+
+
+def any_open(exchanges=tuple(EXCHANGES), when=None):
+    ts = _ts(when)
+    return any(is_open(ex, ts) for ex in exchanges)
+
+
+def next_open_ts(exchange, when=None):
+    """Epoch seconds of the next session open at or after `when`.
+
+    Returns `when` itself if the exchange is already open.
+    """
+    ts = _ts(when)
+    if is_open(exchange, ts):
+        return ts
+    year = _local_year(exchange, ts)
+    for y in (year, year + 1):
+        opens, _ = sessions(exchange, y)
+        i = bisect_right(opens, ts)
+        if i < len(opens):
+            return opens[i]
+    raise ValueError(f"no {exchange} session found after {ts}")
+
+
+def next_open(exchange, when=None):
+    return datetime.fromtimestamp(next_open_ts(exchange, when), timezone.utc)
+
+
+def next_any_open_ts(exchanges=tuple(EXCHANGES), when=None):
+    ts = _ts(when)
+    return min(next_open_ts(ex, ts) for ex in exchanges)
@@ -1,34 +1,292 @@
-import sqlite3
+import db
+import joblock
+import metrics
+import profiler
+import publish
 import os
 import datetime
-from zoneinfo import ZoneInfo
+import hashlib
+import json
+import re
+from trading_calendar import is_open
+from artifacts import precompress, remove_siblings, write_if_changed
+from templates import Template, safe_url
 
-db_path = 'joeclaw.db'
-html_path = 'index.html'
+db_path = db.DB_PATH
+html_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index.html')
+pages_dir = os.path.dirname(os.path.abspath(__file__))  # news_<cat>.html
+news_public_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'public', 'news')
+api_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'public', 'api')
+API_VERSION = 1
+static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+assets_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+STATIC_ASSETS = ('app.css', 'app.js')
+KEEP_ASSET_VERSIONS = 2  # old fingerprints kept for pages still cached by browsers
+render_cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'render_cache.json')
 
 def is_us_market_open(now_utc=None):
-    # US market hours (NYSE/Nasdaq): Mon-Fri 09:30-16:00 America/New_York (ET)
-    if now_utc is None:
-        now_utc = datetime.datetime.now(datetime.timezone.utc)
+    # US market hours (NYSE/Nasdaq): Mon-Fri 09:30-16:00 America/New_York (ET), NYSE holidays excluded
+    return is_open('US', now_utc)
+
+
+def content_hash(value):
+    """Stable hash of any JSON-serialisable render input."""
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """Fragments keyed by section name, reused while their input hash matches."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Warning: ignoring unreadable render cache {path}: {e}")
+
+    def render(self, key, inputs, render_fn):
+        digest = content_hash(inputs)
+        entry = self.entries.get(key)
+        if entry and entry.get('hash') == digest:
+            return entry['html'], False
+        html = render_fn()
+        self.entries[key] = {'hash': digest, 'html': html}
+        self.dirty = True
+        return html, True
+
+    def unchanged(self, key, digest):
+        return (self.entries.get(key) or {}).get('hash') == digest
+
+    def mark(self, key, digest):
+        self.entries[key] = {'hash': digest}
+        self.dirty = True
+
+    def save(self):
+        if self.dirty:
+            write_if_changed(self.path, json.dumps(self.entries, ensure_ascii=False))
+            self.dirty = False
+
+
+MARKET_ITEM = Template("""
+                <div class="market-item">
+                    <div class="asset-info">
+                        <span class="asset-name">{{ name }}</span>
+                        <span class="asset-price">{{ price }}</span>
+                    </div>
+                    <span class="asset-change {{ change_class }}">{{ change }}</span>
+                </div>""")
+
+MARKET_CARD = Template("""
+        <section class="card">
+            <h2>{{ category }} {{ header_extra }} <span>{{ icon }}</span></h2>
+            <div class="market-list">
+                {{ items }}
+            </div>
+        </section>""")
+
+DEALS_JS = Template("const deals = {{ deals|json }};")
+
+NEWS_PREVIEW_ITEM = Template("""
+                <div class="market-item">
+                    <div class="asset-info">
+                        <span class="asset-name">{{ title }}</span>
+                        <span class="asset-price">{{ source }}</span>
+                    </div>
+                    <div style="width:100%;margin-top:0.5rem;">{{ summary }} <a href="{{ link|url }}" target="_blank">（原文）</a></div>
+                </div>""")
+
+NEWS_SECTION = Template("""
+            <section class="card">
+                <h2>{{ title }} <span>📰</span></h2>
+                <div class="market-list">{{ items }}</div>
+                <div style="margin-top:0.5rem;">直接顯示分類內容</div>
+            </section>""")
+
+NEWS_PAGE_ITEM = Template("""
+            <div class="market-item" style="flex-direction:column;align-items:flex-start;">
+                <div style="font-weight:700;">{{ title }}</div>
+                <div style="color:#94a3b8;font-size:0.9rem;">{{ source }} • {{ fetched_at }}</div>
+                <div style="margin-top:0.25rem;">{{ summary }} <a href="{{ link|url }}" target="_blank">（原文）</a></div>
+            </div>
+            <hr/>""")
+
+NEWS_PAGE = Template("""
+        <!doctype html>
+        <html lang="zh-TW"> 
+        <head>
+        <meta charset="utf-8">
+        <meta name="viewport" content="width=device-width,initial-scale=1">
+        <title>{{ title }} - JoeClawSite</title>
+        <style>body{font-family:Inter,system-ui,sans-serif;background:#020617;color:#f8fafc;padding:2rem}.market-item{padding:0.75rem 0}</style>
+        </head>
+        <body>
+        <h1>{{ title }}</h1>
+        <div>
+        {{ items }}
+        </div>
+        <div style="margin-top:1rem"><a href="index.html">回到首頁</a></div>
+        </body>
+        </html>
+        """)
+
+
+def _news_context(item):
+    return {
+        'title': item.get('title'),
+        'source': item.get('source'),
+        'summary': item.get('summary'),
+        'link': item.get('link'),
+        'fetched_at': item.get('fetched_at'),
+    }
+
+
+def write_api_snapshot(name, data, generated_at, written=None):
+    """Write public/api/<name>.json when data changed and return its hash.
+
+    The page polls these snapshots; `hash` lets it skip re-rendering, and
+    generated_at only moves when the data actually changed. The path is
+    appended to `written` when the file was rewritten.
+    """
+    digest = content_hash(data)[:16]
+    path = os.path.join(api_dir, f"{name}.json")
     try:
-        ny = now_utc.astimezone(ZoneInfo('America/New_York'))
-    except Exception:
-        # fallback: assume not trading
-        return False
-    if ny.weekday() >= 5:  # Saturday=5 Sunday=6
-        return False
-    open_time = ny.replace(hour=9, minute=30, second=0, microsecond=0)
-    close_time = ny.replace(hour=16, minute=0, second=0, microsecond=0)
-    return open_time <= ny <= close_time
+        with open(path, 'r', encoding='utf-8') as f:
+            if json.load(f).get('hash') == digest:
+                precompress(path)
+                return digest
+    except (FileNotFoundError, ValueError):
+        pass
+    payload = {'version': API_VERSION, 'generated_at': generated_at, 'hash': digest, 'data': data}
+    if write_if_changed(path, json.dumps(payload, ensure_ascii=False, separators=(',', ':')), compress=True) \
+            and written is not None:
+        written.append(path)
+    return digest
+
+
+def publish_assets(names=STATIC_ASSETS, written=None):
+    """Copy static/<name> to assets/<stem>.<hash><ext> and return {name: url}.
+
+    The file name changes whenever the content does, so the assets can be
+    served with a far-future cache lifetime while index.html stays small.
+    Only the newest KEEP_ASSET_VERSIONS fingerprints of each asset are kept.
+    New and pruned files are appended to `written`.
+    """
+    urls = {}
+    for name in names:
+        with open(os.path.join(static_dir, name), 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        fingerprinted = f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+        path = os.path.join(assets_dir, fingerprinted)
+        if write_if_changed(path, data, compress=True) and written is not None:
+            written.append(path)
+        urls[name] = f"assets/{fingerprinted}"
+
+        pattern = re.compile(rf'^{re.escape(stem)}\.[0-9a-f]{{10}}{re.escape(ext)}$')
+        versions = sorted(
+            (f for f in os.listdir(assets_dir) if pattern.match(f) and f != fingerprinted),
+            key=lambda f: os.path.getmtime(os.path.join(assets_dir, f)), reverse=True)
+        for stale in versions[KEEP_ASSET_VERSIONS - 1:]:
+            os.remove(os.path.join(assets_dir, stale))
+            remove_siblings(os.path.join(assets_dir, stale))
+            if written is not None:
+                written.append(os.path.join(assets_dir, stale))
+    return urls
+
+
+def market_header_extra(cat, trading_now):
+    # If market is closed, add a note to the header
+    return '（非交易時間）' if (not trading_now and 'Stocks' in cat) else ''
+
 
+def render_market_cards(categories, trading_now, icons):
+    cards = []
+    for cat, items in categories.items():
+        header_extra = market_header_extra(cat, trading_now)
+        # Use final price as stored in DB; if market closed, we assume DB contains last close
+        items_html = MARKET_ITEM.render_each(
+            {
+                'name': item['name'],
+                'price': item['price'],
+                'change': item.get('change') or '',
+                'change_class': "change-up" if "+" in (item.get('change') or '') else "change-down",
+            }
+            for item in items
+        )
+        cards.append(MARKET_CARD.render(category=cat, header_extra=header_extra, icon=icons.get(cat, '📊'), items=items_html))
+    return ''.join(cards)
+
+
+def promotion_items(promo_rows):
+    # row may include updated_at at index 5
+    deals = []
+    for row in promo_rows:
+        platform, name, deal_price, original_price, url = (list(row) + [''] * 5)[:5]
+        deals.append({
+            'platform': platform or '',
+            'name': name or '',
+            'price': deal_price or '',
+            'original': original_price or '',
+            'url': safe_url(url),
+        })
+    return deals
+
+
+def render_deals_js(promo_rows):
+    # Build promotions JS array (client-side)
+    return DEALS_JS.render(deals=promotion_items(promo_rows))
+
+
+def render_news_preview(title, filtered_items):
+    # build top-3 preview
+    if not filtered_items:
+        return ''
+    items_html = NEWS_PREVIEW_ITEM.render_each(_news_context(it) for it in filtered_items[:3])
+    return NEWS_SECTION.render(title=title, items=items_html)
+
+
+def render_news_page(title, filtered_items):
+    # build full page for this category
+    items_html = NEWS_PAGE_ITEM.render_each(_news_context(it) for it in filtered_items)
+    return NEWS_PAGE.render(title=title, items=items_html)
+
+
+@joblock.exclusive('html')
+@metrics.timed('generate_html')
+@profiler.profile('html')
 def generate_html():
-    conn = sqlite3.connect(db_path)
+    """Regenerate index.html and the news pages from joeclaw.db.
+
+    Each section is rendered only when the hash of its input rows differs
+    from the one in the render cache, and files are only rewritten (via an
+    atomic rename) when their bytes change. index.html is left untouched,
+    including its "last updated" stamp, when none of its inputs changed.
+    Whenever any file was written a publish is queued (see publish.py).
+    Returns True if index.html was rewritten.
+    """
+    written = []
+    try:
+        return _generate(written)
+    finally:
+        if written:
+            publish.enqueue('html')
+
+
+def _generate(written):
+    cache = RenderCache(render_cache_path)
+    conn = db.connect(db_path)
     cursor = conn.cursor()
 
     # Fetch all market data (robust: if table missing, continue with empty market cards)
     rows = []
     try:
-        cursor.execute("SELECT category, name, price, change FROM market_data")
+        cursor.execute("SELECT category, name, price, change FROM market_data ORDER BY id")
         rows = cursor.fetchall()
     except Exception as e:
         print(f"Warning: could not fetch market_data: {e}")
@@ -48,7 +306,7 @@ def generate_html():
     # Fetch promotions so we can inject them into the client-side JS
     promo_rows = []
     try:
-        cursor.execute("SELECT platform, name, deal_price, original_price, url, updated_at FROM promotions")
+        cursor.execute("SELECT platform, name, deal_price, original_price, url, updated_at FROM promotions ORDER BY id")
         promo_rows = cursor.fetchall()
     except Exception as e:
         print(f"Warning: could not fetch promotions: {e}")
@@ -58,6 +316,11 @@ def generate_html():
 
     # Determine if US market is open now (used to decide whether to perform live refresh on client)
     trading_now = is_us_market_open()
+    us_flag = trading_now
+    tw_flag = is_open('TW')
+    jp_flag = is_open('JP')
+    any_flag = us_flag or tw_flag or jp_flag
+    generated_at = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
     # Define icons for categories
     icons = {
@@ -68,56 +331,18 @@ def generate_html():
     }
 
     # Generate the cards HTML
-    cards_html = ""
-    for cat, items in categories.items():
-        icon = icons.get(cat, '📊')
-        # If market is closed, add a note to the header
-        header_extra = '（非交易時間）' if (not trading_now and 'Stocks' in cat) else ''
-        items_html = ""
-        for item in items:
-            change_text = item['change'] if item.get('change') is not None else ''
-            change_class = "change-up" if "+" in change_text else "change-down"
-            # Use final price as stored in DB; if market closed, we assume DB contains last close
-            items_html += f"""
-                <div class=\"market-item\">
-                    <div class=\"asset-info\">
-                        <span class=\"asset-name\">{item['name']}</span>
-                        <span class=\"asset-price\">{item['price']}</span>
-                    </div>
-                    <span class=\"asset-change {change_class}\">{change_text}</span>
-                </div>"""
-
-        cards_html += f"""
-        <section class=\"card\">
-            <h2>{cat} {header_extra} <span>{icon}</span></h2>
-            <div class=\"market-list\">
-                {items_html}
-            </div>
-        </section>"""
+    cards_html, _ = cache.render(
+        'market_cards', [categories, trading_now, icons],
+        lambda: render_market_cards(categories, trading_now, icons))
 
-    # Build promotions JS array (client-side)
-    deals_js_items = []
-    for row in promo_rows:
-        # row may include updated_at at index 5
-        platform = row[0] if len(row) > 0 else ''
-        name = row[1] if len(row) > 1 else ''
-        deal_price = row[2] if len(row) > 2 else ''
-        original_price = row[3] if len(row) > 3 else ''
-        url = row[4] if len(row) > 4 else ''
-        name_esc = (name.replace("'", "\\'") if name else '')
-        platform_esc = (platform.replace("'", "\\'") if platform else '')
-        url_esc = (url.replace("'", "\\'") if url else '')
-        deals_js_items.append("{" + f" platform: '{platform_esc}', name: '{name_esc}', price: '{deal_price}', original: '{original_price}', url: '{url_esc}' " + "}")
-
-    deals_js = "const deals = [\n" + ",\n".join(deals_js_items) + "\n];"
+    deals_js, _ = cache.render('deals_js', promo_rows, lambda: render_deals_js(promo_rows))
 
     # Read news JSON (top-3 per category) and build HTML sections + full pages
-    import json
-    news_public = os.path.join(os.path.dirname(__file__), 'public', 'news')
     news_sections_html = ""
+    news_sections = []
     seen_titles = set()
     for cat, title in [('ai', 'AI 最新'), ('health', '智慧醫療 最新')]:
-        json_path = os.path.join(news_public, f"{cat}.json")
+        json_path = os.path.join(news_public_dir, f"{cat}.json")
         items = []
         try:
             with open(json_path, 'r', encoding='utf-8') as jf:
@@ -135,58 +360,48 @@ def generate_html():
             seen_titles.add(t)
             filtered_items.append(it)
 
-        # build top-3 preview
-        preview_html = ''
-        for item in filtered_items[:3]:
-            preview_html += f"""
-                <div class=\"market-item\">
-                    <div class=\"asset-info\">
-                        <span class=\"asset-name\">{item.get('title')}</span>
-                        <span class=\"asset-price\">{item.get('source')}</span>
-                    </div>
-                    <div style=\"width:100%;margin-top:0.5rem;\">{item.get('summary')} <a href=\"{item.get('link')}\" target=\"_blank\">（原文）</a></div>
-                </div>"""
-        if preview_html:
-            news_sections_html += f"""
-            <section class=\"card\">
-                <h2>{title} <span>📰</span></h2>
-                <div class=\"market-list\">{preview_html}</div>
-                <div style=\"margin-top:0.5rem;\">直接顯示分類內容</div>
-            </section>"""
-        # build full page for this category
-        full_items_html = ''
-        for item in filtered_items:
-            full_items_html += f"""
-            <div class=\"market-item\" style=\"flex-direction:column;align-items:flex-start;\">
-                <div style=\"font-weight:700;\">{item.get('title')}</div>
-                <div style=\"color:#94a3b8;font-size:0.9rem;\">{item.get('source')} • {item.get('fetched_at')}</div>
-                <div style=\"margin-top:0.25rem;\">{item.get('summary')} <a href=\"{item.get('link')}\" target=\"_blank\">（原文）</a></div>
-            </div>
-            <hr/>"""
-        page_html = f"""
-        <!doctype html>
-        <html lang=\"zh-TW\"> 
-        <head>
-        <meta charset=\"utf-8\">
-        <meta name=\"viewport\" content=\"width=device-width,initial-scale=1\">
-        <title>{title} - JoeClawSite</title>
-        <style>body{{font-family:Inter,system-ui,sans-serif;background:#020617;color:#f8fafc;padding:2rem}}.market-item{{padding:0.75rem 0}}</style>
-        </head>
-        <body>
-        <h1>{title}</h1>
-        <div>
-        {full_items_html}
-        </div>
-        <div style=\"margin-top:1rem\"><a href=\"index.html\">回到首頁</a></div>
-        </body>
-        </html>
-        """
+        preview_html, _ = cache.render(
+            f'news_preview_{cat}', [title, filtered_items[:3]],
+            lambda: render_news_preview(title, filtered_items))
+        news_sections_html += preview_html
+        if filtered_items:
+            news_sections.append({'category': cat, 'title': title, 'items': [_news_context(it) for it in filtered_items[:3]]})
+        # full pages are only re-rendered and rewritten when their items change
+        page_key = f'news_page_{cat}'
+        page_digest = content_hash([title, filtered_items])
+        page_path = os.path.join(pages_dir, f"news_{cat}.html")
         try:
-            with open(os.path.join(os.path.dirname(__file__), f"news_{cat}.html"), 'w', encoding='utf-8') as pf:
-                pf.write(page_html)
+            if not cache.unchanged(page_key, page_digest) or not os.path.exists(page_path):
+                if write_if_changed(page_path, render_news_page(title, filtered_items), compress=True):
+                    written.append(page_path)
+                cache.mark(page_key, page_digest)
+            else:
+                precompress(page_path)
         except Exception:
             pass
 
+    # Static JSON snapshots polled by the page instead of scraping upstream APIs per visitor
+    snapshot_hashes = {
+        'market': write_api_snapshot('market', {
+            'trading': {'us': us_flag, 'tw': tw_flag, 'jp': jp_flag},
+            'categories': [
+                {'name': cat, 'icon': icons.get(cat, '📊'), 'note': market_header_extra(cat, trading_now), 'items': items}
+                for cat, items in categories.items()
+            ],
+        }, generated_at, written),
+        'news': write_api_snapshot('news', {'sections': news_sections}, generated_at, written),
+        'promotions': write_api_snapshot('promotions', {'items': promotion_items(promo_rows)}, generated_at, written),
+    }
+
+    # Skip index.html entirely when none of its inputs changed since the last write
+    asset_urls = publish_assets(written=written)
+    page_digest = content_hash([cards_html, news_sections_html, deals_js, us_flag, tw_flag, jp_flag, snapshot_hashes, asset_urls])
+    if cache.unchanged('index_page', page_digest) and os.path.exists(html_path):
+        cache.save()
+        precompress(html_path)
+        print("index.html unchanged; skipped rewrite.")
+        return False
+
     # Read original HTML
     try:
         with open(html_path, 'r', encoding='utf-8') as f:
@@ -199,81 +414,50 @@ def generate_html():
     # Replace the <main> content
     start_tag = "<main>"
     end_tag = "</main>"
-    start_idx = html_content.find(start_tag) + len(start_tag)
+    start_idx = html_content.find(start_tag)
     end_idx = html_content.find(end_tag)
     if start_idx == -1 or end_idx == -1:
         # fallback: append main
         new_html = html_content + "<main>" + cards_html + news_sections_html + "</main>"
     else:
+        start_idx += len(start_tag)
         new_html = html_content[:start_idx] + cards_html + news_sections_html + html_content[end_idx:]
 
-    # Replace the static deals array in the JS refreshPromotions() function
-    marker_start = 'const deals = ['
-    if marker_start in new_html:
-        s_idx = new_html.find(marker_start)
-        e_idx = new_html.find('];', s_idx)
-        if e_idx != -1:
-            e_idx += 2  # include the closing ];
-            new_html = new_html[:s_idx] + deals_js + new_html[e_idx:]
+    # Point <link>/<script> tags at the current fingerprinted asset files
+    for name, url in asset_urls.items():
+        new_html = re.sub(rf'((?:href|src)=")[^"]*("[^>]*\bdata-asset="{re.escape(name)}")',
+                          lambda m: f'{m.group(1)}{url}{m.group(2)}', new_html)
 
     # Inject multi-market trading flags and last-updated into the page (inject script after <body>)
-    generated_at = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    # determine multi-market flags
-    us_flag = is_us_market_open()
-    def is_tw_market_open(now_utc=None):
-        if now_utc is None:
-            now_utc = datetime.datetime.now(datetime.timezone.utc)
-        try:
-            tz = now_utc.astimezone(ZoneInfo('Asia/Taipei'))
-        except Exception:
-            return False
-        if tz.weekday() >= 5:
-            return False
-        open_t = tz.replace(hour=9, minute=0, second=0, microsecond=0)
-        close_t = tz.replace(hour=13, minute=30, second=0, microsecond=0)
-        return open_t <= tz <= close_t
-    tw_flag = is_tw_market_open()
-    def is_jp_market_open(now_utc=None):
-        if now_utc is None:
-            now_utc = datetime.datetime.now(datetime.timezone.utc)
-        try:
-            tz = now_utc.astimezone(ZoneInfo('Asia/Tokyo'))
-        except Exception:
-            return False
-        if tz.weekday() >= 5:
-            return False
-        morning_start = tz.replace(hour=9, minute=0, second=0, microsecond=0)
-        morning_end = tz.replace(hour=11, minute=30, second=0, microsecond=0)
-        aft_start = tz.replace(hour=12, minute=30, second=0, microsecond=0)
-        aft_end = tz.replace(hour=15, minute=0, second=0, microsecond=0)
-        return (morning_start <= tz <= morning_end) or (aft_start <= tz <= aft_end)
-    jp_flag = is_jp_market_open()
-    any_flag = us_flag or tw_flag or jp_flag
     trading_flag_script = (
         f"<script>const TRADING_LIVE_US = {str(us_flag).lower()}; "
         f"const TRADING_LIVE_TW = {str(tw_flag).lower()}; "
         f"const TRADING_LIVE_JP = {str(jp_flag).lower()}; "
-        f"const TRADING_LIVE = {str(any_flag).lower()}; const PAGE_GENERATED_AT = '{generated_at}';</script>"
+        f"const TRADING_LIVE = {str(any_flag).lower()}; const PAGE_GENERATED_AT = '{generated_at}'; "
+        f"const SNAPSHOT_HASHES = {json.dumps(snapshot_hashes)}; {deals_js}</script>"
     )
-    import re
     new_html = re.sub(r'<script>\s*const\s+TRADING_LIVE[\s\S]*?</script>\s*', '', new_html, flags=re.S)
     if '<body' in new_html:
         new_html = new_html.replace('<body>', '<body>\n' + trading_flag_script)
     else:
         new_html = trading_flag_script + new_html
 
-    # Inject last-updated into the status bar (replace SYSTEM LIVE with timestamp)
-    new_html = new_html.replace('SYSTEM LIVE', f'SYSTEM LIVE — 最後更新: {generated_at}')
-    # Update deploy marker comment if present
+    # Inject last-updated into the status bar (replace any previous stamps so they don't pile up)
+    new_html = re.sub(r'(<span id="sync-status">)SYSTEM LIVE(?: — 最後更新: \d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})*',
+                      lambda m: f'{m.group(1)}SYSTEM LIVE — 最後更新: {generated_at}', new_html)
+    # Update deploy marker comment if present (keep the comment closed)
     if 'DEPLOY_MARKER:' in new_html:
-        # simple replace for marker line
-        import re
-        new_html = re.sub(r'DEPLOY_MARKER: .*', f'DEPLOY_MARKER: {generated_at}', new_html)
+        new_html = re.sub(r'DEPLOY_MARKER: [^\n]*', f'DEPLOY_MARKER: {generated_at} -->', new_html)
 
-    with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(new_html)
+    rewritten = write_if_changed(html_path, new_html, compress=True)
+    if rewritten:
+        written.append(html_path)
+    cache.mark('index_page', page_digest)
+    cache.save()
 
     print(f"index.html updated successfully (market cards + promotions injected and news sections generated). Generated at {generated_at}.")
+    return rewritten
 
 if __name__ == "__main__":
-    generate_html()
+    with metrics.run('html'):
+        generate_html()
@@ -1,16 +1,22 @@
+# Only stdlib at module level: most cron ticks land outside trading hours and
+# exit right after is_market_open(). yfinance/pandas, requests and update_html
+# are imported inside the functions that need them.
 import sqlite3
-import yfinance as yf
-import requests
-import holidays
-import pytz
-from datetime import datetime, time
-import subprocess
+from datetime import datetime
+from zoneinfo import ZoneInfo
 import os
 import json
-from update_html import generate_html
+from concurrent.futures import ThreadPoolExecutor, wait
+import db
+import joblock
+import metrics
+import profiler
+import publish
+from price_history import record_ticks
+from trading_calendar import any_open
 
 # Configuration
-DB_PATH = 'joeclaw.db'
+DB_PATH = db.DB_PATH
 TICKERS = {
     '^GSPC': 'S&P 500',
     '^IXIC': 'Nasdaq',
@@ -19,29 +25,18 @@ TICKERS = {
     'AAPL': 'Apple',
     'BTC-USD': 'Bitcoin'
 }
+QUOTE_WORKERS = 16   # max concurrent quote requests
+QUOTE_TIMEOUT = 15   # seconds for the whole quote batch
+POLYMARKET_QUERIES = ["Fed rate cut", "Bitcoin price", "Taiwan"]
 
 # Market Hours (Asia/Taipei)
-TAIPEI_TZ = pytz.timezone('Asia/Taipei')
-US_TZ = pytz.timezone('America/New_York')
+TAIPEI_TZ = ZoneInfo('Asia/Taipei')
+# exchanges whose sessions trigger a refresh; hours and holidays live in trading_calendar
+MARKETS = ('TW', 'US')
 
 def is_market_open():
     """Check if either Taiwan or US markets are currently open."""
-    now_tp = datetime.now(TAIPEI_TZ)
-    
-    # Taiwan Market: Mon-Fri 09:00 - 13:30
-    tw_holidays = holidays.Taiwan()
-    if now_tp.weekday() < 5 and now_tp.date() not in tw_holidays:
-        if time(9, 0) <= now_tp.time() <= time(13, 30):
-            return True
-
-    # US Market: Mon-Fri 09:30 - 16:00 (New York Time)
-    now_ny = datetime.now(US_TZ)
-    us_holidays = holidays.UnitedStates()
-    if now_ny.weekday() < 5 and now_ny.date() not in us_holidays:
-        if time(9, 30) <= now_ny.time() <= time(16, 0):
-            return True
-
-    return False
+    return any_open(MARKETS)
 
 def get_category(ticker):
     if '.TW' in ticker: return 'Taiwan Stocks'
@@ -49,119 +44,209 @@ def get_category(ticker):
     if ticker == 'BTC-USD': return 'Crypto'
     return 'Tech Stocks'
 
-def get_yfinance_data():
-    data = []
-    for ticker, name in TICKERS.items():
+def fetch_closes(ticker):
+    """Return the last two daily closes for ticker (oldest first)."""
+    import yfinance as yf
+    hist = yf.Ticker(ticker).history(period="2d")
+    if hist.empty:
+        return []
+    return [float(v) for v in hist['Close']]
+
+def format_quote(ticker, name, closes):
+    if not closes:
+        return None
+    price = closes[-1]
+    change = 0.0
+    change_str = "0.00%"
+    if len(closes) > 1:
+        prev = closes[-2]
+        change = (price - prev) / prev * 100
+        change_str = f"{change:+.2f}%"
+
+    return {
+        'category': get_category(ticker),
+        'name': name,
+        'price': f"${price:,.2f}" if ticker != '^GSPC' and ticker != '^IXIC' else f"{price:,.2f}",
+        'change': change_str,
+        # numeric copies for price_history
+        'symbol': ticker,
+        'value': price,
+        'change_pct': change
+    }
+
+@metrics.timed('get_yfinance_data', items=len)
+def get_yfinance_data(tickers=None, fetch=fetch_closes, max_workers=QUOTE_WORKERS, timeout=QUOTE_TIMEOUT):
+    """Fetch all tickers concurrently on a bounded thread pool.
+
+    Every ticker shares one deadline of `timeout` seconds from the start of the
+    batch; symbols that have not answered by then are dropped and the quotes
+    that did arrive are returned. `fetch` can be swapped for a stub in tests.
+    """
+    if tickers is None:
+        tickers = TICKERS
+    if not tickers:
+        return []
+
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(tickers)))
+    futures = {pool.submit(fetch, ticker): ticker for ticker in tickers}
+    done, pending = wait(futures, timeout=timeout)
+    pool.shutdown(wait=False, cancel_futures=True)
+
+    results = {}
+    for fut in done:
+        ticker = futures[fut]
         try:
-            t = yf.Ticker(ticker)
-            hist = t.history(period="2d")
-            if not hist.empty:
-                price = hist['Close'].iloc[-1]
-                change_str = "0.00%"
-                if len(hist) > 1:
-                    prev = hist['Close'].iloc[-2]
-                    change = (price - prev) / prev * 100
-                    change_str = f"{change:+.2f}%"
-                
-                data.append({
-                    'category': get_category(ticker),
-                    'name': name,
-                    'price': f"${price:,.2f}" if ticker != '^GSPC' and ticker != '^IXIC' else f"{price:,.2f}",
-                    'change': change_str
-                })
+            quote = format_quote(ticker, tickers[ticker], fut.result())
         except Exception as e:
             print(f"Error fetching {ticker}: {e}")
-    return data
+            continue
+        if quote:
+            results[ticker] = quote
+    for fut in pending:
+        print(f"Timed out fetching {futures[fut]} after {timeout}s")
+
+    # Keep the watchlist order so the rendered cards stay stable between runs
+    return [results[t] for t in tickers if t in results]
+
+def parse_market(m):
+    # Robust outcome price parsing
+    prices = json.loads(m.get('outcomePrices') or '[]')
+    outcomes = json.loads(m.get('outcomes') or '[]')
+
+    if not prices or not outcomes:
+        return None
+
+    # Find 'Yes' or the first outcome
+    target_idx = 0
+    if 'Yes' in outcomes:
+        target_idx = outcomes.index('Yes')
+
+    prob = float(prices[target_idx]) * 100
+    change_val = (m.get('oneDayPriceChange') or 0) * 100
+
+    return {
+        'category': 'Polymarket',
+        'name': m['question'],
+        'price': f"{prob:.1f}%",
+        'change': f"{change_val:+.1f}%",
+        'symbol': m.get('slug') or m['question'],
+        'value': prob,
+        'change_pct': change_val
+    }
+
+@metrics.timed('get_polymarket_data', items=len)
+def get_polymarket_data(queries=None, **client_kwargs):
+    if queries is None:
+        queries = POLYMARKET_QUERIES
+    import asyncio
+    from polymarket_client import fetch_markets
+    try:
+        markets = asyncio.run(fetch_markets(queries, **client_kwargs))
+    except Exception as e:
+        metrics.fail(e)
+        print(f"Polymarket error: {e}")
+        return []
 
-def get_polymarket_data():
     data = []
-    queries = ["Fed rate cut", "Bitcoin price", "Taiwan"]
-    for query in queries:
+    for m in markets:
         try:
-            url = f"https://gamma-api.polymarket.com/markets?active=true&closed=false&limit=3&query={query}"
-            resp = requests.get(url, timeout=10)
-            if resp.status_code == 200:
-                for m in resp.json():
-                    try:
-                        # Robust outcome price parsing
-                        prices = json.loads(m.get('outcomePrices', '[]'))
-                        outcomes = json.loads(m.get('outcomes', '[]'))
-                        
-                        if not prices or not outcomes: continue
-                        
-                        # Find 'Yes' or the first outcome
-                        target_idx = 0
-                        if 'Yes' in outcomes:
-                            target_idx = outcomes.index('Yes')
-                        
-                        prob = float(prices[target_idx]) * 100
-                        change_val = m.get('oneDayPriceChange', 0) * 100
-                        
-                        data.append({
-                            'category': 'Polymarket',
-                            'name': m['question'],
-                            'price': f"{prob:.1f}%",
-                            'change': f"{change_val:+.1f}%"
-                        })
-                    except:
-                        continue
-        except Exception as e:
-            print(f"Polymarket error for {query}: {e}")
+            item = parse_market(m)
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            print(f"Skipping Polymarket market {m.get('id', '?')}: {e}")
+            continue
+        if item:
+            data.append(item)
     return data
 
+def ensure_schema(conn):
+    """Migrate market_data to one row per (category, name).
+
+    Older databases appended a new row on every change; keep only the most
+    recent row of each market before adding the unique index.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS market_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT NOT NULL,
+            name TEXT NOT NULL,
+            price TEXT NOT NULL,
+            change TEXT NOT NULL
+        )
+    """)
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'market_data_key'"
+    ).fetchone()
+    if exists:
+        return
+    with db.transaction(conn):
+        removed = conn.execute("""
+            DELETE FROM market_data WHERE id NOT IN (
+                SELECT MAX(id) FROM market_data GROUP BY category, name
+            )
+        """).rowcount
+        conn.execute("CREATE UNIQUE INDEX market_data_key ON market_data (category, name)")
+    print(f"Migrated market_data: removed {removed} duplicate rows, added unique key (category, name).")
+
+UPSERT_SQL = """
+    INSERT INTO market_data (category, name, price, change)
+    VALUES (:category, :name, :price, :change)
+    ON CONFLICT (category, name) DO UPDATE
+        SET price = excluded.price, change = excluded.change
+        WHERE price != excluded.price OR change != excluded.change
+"""
+
+@metrics.timed('update_db')
 def update_db(data):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    changed = False
-    
-    for item in data:
-        cursor.execute("SELECT price, change FROM market_data WHERE name = ?", (item['name'],))
-        row = cursor.fetchone()
-        if not row or row[0] != item['price'] or row[1] != item['change']:
-            changed = True
-            cursor.execute("""
-                INSERT OR REPLACE INTO market_data (category, name, price, change)
-                VALUES (?, ?, ?, ?)
-            """, (item['category'], item['name'], item['price'], item['change']))
-    
-    conn.commit()
-    conn.close()
-    return changed
-
-def git_sync():
+    """Upsert all items in one statement batch; return True if any row changed.
+
+    Unchanged rows hit the WHERE clause of the DO UPDATE and are not counted
+    by SQLite, so the total_changes delta is exactly the number of inserted
+    or modified markets.
+    """
+    metrics.annotate(items=len(data))
+    conn = db.connect(DB_PATH)
     try:
-        # Add DB and generated index.html
-        subprocess.run(["git", "add", "joeclaw.db", "index.html"], check=True)
-        # Check if there are changes
-        status = subprocess.run(["git", "diff", "--cached", "--quiet"])
-        if status.returncode != 0:
-            subprocess.run(["git", "commit", "-m", f"Site Auto-Update: {datetime.now(TAIPEI_TZ).strftime('%Y-%m-%d %H:%M')}"], check=True)
-            subprocess.run(["git", "push"], check=True)
-            print("Successfully synced to GitHub.")
-        else:
-            print("No changes to sync.")
-    except Exception as e:
-        print(f"Git sync error: {e}")
+        ensure_schema(conn)
+        before = conn.total_changes
+        with db.transaction(conn):
+            conn.executemany(UPSERT_SQL, data)
+        changed = conn.total_changes - before
+    finally:
+        conn.close()
+    return changed > 0
 
+@joblock.exclusive('market')
 def main():
     is_manual = os.getenv("MANUAL_RUN") == "1"
     if not is_manual and not is_market_open():
         print("Markets closed. Skipping update.")
+        # still push the day's last debounced batch; a no-op when nothing is queued
+        publish.flush()
         return
 
     print(f"Updating JoeClawSite data at {datetime.now(TAIPEI_TZ).strftime('%Y-%m-%d %H:%M:%S')}...")
-    
-    all_data = get_yfinance_data() + get_polymarket_data()
-    
-    if all_data:
-        if update_db(all_data):
-            print("DB updated. Re-generating HTML...")
-            generate_html()
-            git_sync()
+
+    # only runs that actually fetch are recorded; closed-market ticks stay cheap
+    with metrics.run('market'), profiler.profile('market'):
+        all_data = get_yfinance_data() + get_polymarket_data()
+
+        if all_data:
+            try:
+                with metrics.stage('record_ticks'):
+                    record_ticks(DB_PATH, all_data)
+            except sqlite3.Error as e:
+                print(f"Warning: could not record price history: {e}")
+            if update_db(all_data):
+                print("DB updated. Re-generating HTML...")
+                from update_html import generate_html
+                generate_html()
+                publish.enqueue('market data')
+            else:
+                print("Data fetch complete. No value changes detected.")
         else:
-            print("Data fetch complete. No value changes detected.")
-    else:
-        print("Failed to fetch any data.")
+            print("Failed to fetch any data.")
+        # commits are batched: this only publishes once the queue has settled
+        publish.flush()
 
 if __name__ == "__main__":
     main()
@@ -1,13 +1,25 @@
-import sqlite3
+import db
 import os
 import urllib.request
+import urllib.error
 import xml.etree.ElementTree as ET
 from html import unescape
 from datetime import datetime
 import json
+import joblock
+import metrics
+import profiler
+import publish
+from artifacts import write_if_changed
+from feed_cache import FeedCache
+from news_dedupe import NearDuplicateIndex, fingerprint, normalize_url, title_hash
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 
-DB = '/home/joe/.openclaw/workspace/joeclaw.db'
+DB = db.DB_PATH
 PUBLIC_DIR = '/home/joe/.openclaw/workspace/public/news'
+FEED_CACHE_PATH = '/home/joe/.openclaw/workspace/.cache/feed_cache.json'
 
 SOURCES = {
     'ai': [
@@ -25,52 +37,169 @@ SOURCES = {
     ]
 }
 
+FETCH_WORKERS = 16   # max feeds fetched at once
+FETCH_TIMEOUT = 10   # per-feed socket timeout (seconds)
+RUN_BUDGET = 30      # wall-clock budget for fetching every feed (seconds)
+ITEMS_PER_FEED = 6
+NEAR_DUP_WINDOW = 1000  # recent stored titles checked for near-duplicates
+
 # Ensure public dir
 os.makedirs(PUBLIC_DIR, exist_ok=True)
 
 # Basic helpers
 
-def fetch_rss(url, timeout=10):
+def _feed_request(url, headers=None):
+    req_headers = {'User-Agent': 'JoeClawSite-Agent/1.0'}
+    if headers:
+        req_headers.update(headers)
+    return urllib.request.Request(url, headers=req_headers)
+
+
+def open_feed(url, timeout=10, headers=None, limit=None):
+    """GET url and return (status, payload, response headers).
+
+    With `limit` the body is parsed straight off the socket and the payload
+    is the list of items (reading stops once `limit` items are found);
+    otherwise the payload is the raw body. A 304 Not Modified answer to a
+    conditional request comes back as (304, None, headers) instead of raising.
+    """
+    req = _feed_request(url, headers)
     try:
-        req = urllib.request.Request(url, headers={'User-Agent': 'JoeClawSite-Agent/1.0'})
         with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return resp.read()
+            if limit is not None:
+                return resp.status, parse_rss_feed(resp, limit=limit), resp.headers
+            body = resp.read()
+            metrics.add_bytes(len(body))
+            return resp.status, body, resp.headers
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, None, e.headers
+        raise
+
+
+@metrics.timed('fetch_rss')
+def fetch_rss(url, timeout=10):
+    try:
+        return open_feed(url, timeout)[1]
     except Exception as e:
+        metrics.fail(e)
         print(f"Warning: failed to fetch {url}: {e}")
         return None
 
 
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+PARSE_CHUNK = 64 * 1024
+
+
+def _rss_item(item):
+    title = item.findtext('title') or ''
+    link = item.findtext('link') or ''
+    desc = item.findtext('description') or item.findtext('summary') or ''
+    pub = item.findtext('pubDate') or item.findtext('updated') or ''
+    return {'title': unescape(title).strip(), 'link': link.strip(), 'description': unescape(desc).strip(), 'pubDate': pub.strip()}
+
+
+def _atom_entry(entry):
+    title = entry.findtext(ATOM_NS + 'title') or ''
+    link_el = entry.find(ATOM_NS + 'link')
+    link = link_el.get('href') if link_el is not None else ''
+    summary = entry.findtext(ATOM_NS + 'summary') or entry.findtext(ATOM_NS + 'content') or ''
+    pub = entry.findtext(ATOM_NS + 'updated') or entry.findtext(ATOM_NS + 'published') or ''
+    return {'title': unescape(title).strip(), 'link': link.strip(), 'description': unescape(summary).strip(), 'pubDate': pub.strip()}
+
+
+def _chunks(source):
+    if isinstance(source, str):
+        yield source
+    elif isinstance(source, (bytes, bytearray)):
+        view = memoryview(source)
+        for i in range(0, len(view), PARSE_CHUNK):
+            yield view[i:i + PARSE_CHUNK]
+    else:
+        # file-like, e.g. an HTTP response
+        while True:
+            chunk = source.read(PARSE_CHUNK)
+            if not chunk:
+                break
+            metrics.add_bytes(len(chunk))
+            yield chunk
+
+
+def _stream_items(chunks, limit):
+    """Pull-parse RSS <item>s / Atom <entry>s until `limit` have been read.
+
+    Each finished item is detached from its parent and cleared so memory
+    stays flat regardless of feed size. RSS items win over Atom entries, as
+    in the original tree-based parser. A parse error is re-raised with the
+    items read so far attached as `items`, so the caller can retry with a
+    cleaned-up body and still fall back to them.
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    rss, atom, stack = [], [], []
+
+    def drain():
+        for event, elem in parser.read_events():
+            if event == 'start':
+                stack.append(elem)
+                continue
+            stack.pop()
+            if elem.tag == 'item':
+                rss.append(_rss_item(elem))
+            elif elem.tag == ATOM_NS + 'entry':
+                atom.append(_atom_entry(elem))
+            else:
+                continue
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+        return len(rss or atom) >= limit
+
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            if drain():
+                break
+        else:
+            parser.close()
+            drain()
+    except ET.ParseError as e:
+        e.items = (rss or atom)[:limit]
+        raise
+    return (rss or atom)[:limit]
+
+
+@metrics.timed('parse_rss_feed', items=len)
 def parse_rss_feed(xml_bytes, limit=5):
+    """Parse up to `limit` items from feed bytes, a str, or a readable stream."""
+    if limit <= 0:
+        return []
+    seen = []
+    if isinstance(xml_bytes, (bytes, bytearray, str)):
+        chunks = _chunks(xml_bytes)
+    else:
+        # remember what was read from the stream in case we need the fallback
+        chunks = (seen.append(bytes(c)) or c for c in _chunks(xml_bytes))
     try:
-        root = ET.fromstring(xml_bytes)
+        return _stream_items(chunks, limit)
     except Exception as e:
+        salvaged = getattr(e, 'items', [])
         # try to recover by decoding and replacing bad chars
+        if seen:
+            seen.append(xml_bytes.read())
+            raw = b''.join(seen)
+        else:
+            raw = xml_bytes
         try:
-            txt = xml_bytes.decode('utf-8', errors='ignore')
-            root = ET.fromstring(txt)
+            txt = raw.decode('utf-8', errors='ignore') if isinstance(raw, (bytes, bytearray)) else raw
+            return _stream_items(_chunks(txt), limit)
         except Exception as e2:
+            # e.g. a truncated body: keep whatever parsed before the error
+            salvaged = max(salvaged, getattr(e2, 'items', []), key=len)
+            if salvaged:
+                return salvaged
             print(f"Warning: failed to parse feed: {e2}")
             return []
 
-    items = []
-    # RSS channel/item or Atom
-    for item in root.findall('.//item')[:limit]:
-        title = item.findtext('title') or ''
-        link = item.findtext('link') or ''
-        desc = item.findtext('description') or item.findtext('summary') or ''
-        pub = item.findtext('pubDate') or item.findtext('updated') or ''
-        items.append({'title': unescape(title).strip(), 'link': link.strip(), 'description': unescape(desc).strip(), 'pubDate': pub.strip()})
-    # Atom fallback
-    if not items:
-        for entry in root.findall('.//{http://www.w3.org/2005/Atom}entry')[:limit]:
-            title = entry.findtext('{http://www.w3.org/2005/Atom}title') or ''
-            link_el = entry.find('{http://www.w3.org/2005/Atom}link')
-            link = link_el.get('href') if link_el is not None else ''
-            summary = entry.findtext('{http://www.w3.org/2005/Atom}summary') or entry.findtext('{http://www.w3.org/2005/Atom}content') or ''
-            pub = entry.findtext('{http://www.w3.org/2005/Atom}updated') or entry.findtext('{http://www.w3.org/2005/Atom}published') or ''
-            items.append({'title': unescape(title).strip(), 'link': link.strip(), 'description': unescape(summary).strip(), 'pubDate': pub.strip()})
-    return items
-
 
 def short_summary(text, max_sentences=2):
     # crude: split by period, question, exclamation
@@ -96,10 +225,15 @@ def generate_recommendation(category, title):
     return '；'.join(base[:2])
 
 
-def store_news(records):
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-    c.execute('''
+def ensure_news_schema(conn):
+    """Create the news table and migrate it to a unique fingerprint.
+
+    Older databases re-inserted every article on every run; the migration
+    backfills url_key / title_hash / fingerprint, keeps the first stored copy
+    of each article and adds the UNIQUE index that makes later inserts
+    idempotent.
+    """
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS news (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             category TEXT,
@@ -110,22 +244,81 @@ def store_news(records):
             summary TEXT,
             tags TEXT,
             recommendation TEXT,
-            excerpt TEXT
+            excerpt TEXT,
+            url_key TEXT,
+            title_hash TEXT,
+            fingerprint TEXT
         )
     ''')
-    for r in records:
-        c.execute('INSERT INTO news (category, title, source, url, fetched_at, summary, tags, recommendation, excerpt) VALUES (?,?,?,?,?,?,?,?,?)', (
-            r.get('category'), r.get('title'), r.get('source'), r.get('link'), r.get('fetched_at'), r.get('summary'), ','.join(r.get('tags', [])), r.get('recommendation'), r.get('excerpt')
-        ))
-    conn.commit()
-    conn.close()
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'news_fingerprint'").fetchone():
+        return
+    cols = {row[1] for row in conn.execute('PRAGMA table_info(news)')}
+    with db.transaction(conn):
+        for col in ('url_key', 'title_hash', 'fingerprint'):
+            if col not in cols:
+                conn.execute(f'ALTER TABLE news ADD COLUMN {col} TEXT')
+        rows = conn.execute('SELECT id, url, title FROM news WHERE fingerprint IS NULL').fetchall()
+        conn.executemany('UPDATE news SET url_key = ?, title_hash = ?, fingerprint = ? WHERE id = ?', [
+            (normalize_url(url), title_hash(title), fingerprint(url, title), id_) for id_, url, title in rows
+        ])
+        removed = conn.execute('''
+            DELETE FROM news WHERE id NOT IN (SELECT MIN(id) FROM news GROUP BY fingerprint)
+        ''').rowcount
+        conn.execute('CREATE UNIQUE INDEX news_fingerprint ON news (fingerprint)')
+        conn.execute('CREATE INDEX IF NOT EXISTS news_title_hash ON news (title_hash)')
+    print(f'Migrated news: removed {removed} duplicate rows, added unique fingerprint index.')
+
+
+def known_news(conn, fingerprints):
+    """Return {fingerprint: stored row} for the fingerprints already in the table."""
+    known = {}
+    fps = list(fingerprints)
+    for i in range(0, len(fps), 500):
+        chunk = fps[i:i + 500]
+        marks = ','.join('?' * len(chunk))
+        for fp, fetched_at, summary, rec, excerpt in conn.execute(
+            f'SELECT fingerprint, fetched_at, summary, recommendation, excerpt FROM news WHERE fingerprint IN ({marks})', chunk
+        ):
+            known[fp] = {'fetched_at': fetched_at, 'summary': summary, 'recommendation': rec, 'excerpt': excerpt}
+    return known
+
+
+def near_duplicate_index(conn, recent=NEAR_DUP_WINDOW):
+    """Seed a MinHash index with the titles of the most recent stored articles."""
+    index = NearDuplicateIndex()
+    for fp, title, source in conn.execute('SELECT fingerprint, title, source FROM news ORDER BY id DESC LIMIT ?', (recent,)):
+        index.add(fp, title, source=source)
+    return index
+
+
+@metrics.timed('store_news')
+def store_news(records):
+    """Insert records whose fingerprint is new; return how many were added."""
+    metrics.annotate(items=len(records))
+    conn = db.connect(DB)
+    try:
+        ensure_news_schema(conn)
+        before = conn.total_changes
+        with db.transaction(conn):
+            conn.executemany('''
+                INSERT INTO news (category, title, source, url, fetched_at, summary, tags, recommendation, excerpt, url_key, title_hash, fingerprint)
+                VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+                ON CONFLICT (fingerprint) DO NOTHING
+            ''', [(
+                r.get('category'), r.get('title'), r.get('source'), r.get('link'), r.get('fetched_at'), r.get('summary'), ','.join(r.get('tags', [])), r.get('recommendation'), r.get('excerpt'),
+                normalize_url(r.get('link')), title_hash(r.get('title')), fingerprint(r.get('link'), r.get('title'))
+            ) for r in records])
+        return conn.total_changes - before
+    finally:
+        conn.close()
 
 
 def write_public_json(category, items):
     path = os.path.join(PUBLIC_DIR, f'{category}.json')
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(items, f, ensure_ascii=False, indent=2)
-    print(f'Wrote public JSON: {path}')
+    written = write_if_changed(path, json.dumps(items, ensure_ascii=False, indent=2), compress=True)
+    if written:
+        print(f'Wrote public JSON: {path}')
+    return written
 
 
 def dedupe_keep_latest(entries):
@@ -147,41 +340,136 @@ def dedupe_keep_latest(entries):
     return out
 
 
+@metrics.timed('fetch_feed', items=len)
+def fetch_and_parse(url, timeout=FETCH_TIMEOUT, limit=ITEMS_PER_FEED, cache=None):
+    """Fetch and parse one feed, revalidating against `cache` when given.
+
+    On 304 Not Modified the cached items are returned without downloading or
+    parsing the body.
+    """
+    metrics.annotate(detail=url)
+    if cache is None:
+        try:
+            return open_feed(url, timeout, limit=limit)[1]
+        except Exception as e:
+            metrics.fail(e)
+            print(f"Warning: failed to fetch {url}: {e}")
+            return []
+
+    cached = cache.items(url, limit)
+    headers = cache.conditional_headers(url) if cached is not None else None
+    try:
+        status, items, resp_headers = open_feed(url, timeout, headers, limit=limit)
+    except Exception as e:
+        metrics.fail(e)
+        print(f"Warning: failed to fetch {url}: {e}")
+        return []
+    if status == 304:
+        return cached
+    if items:
+        cache.store(url, resp_headers.get('ETag'), resp_headers.get('Last-Modified'), items, limit)
+    return items
+
+
+def fetch_all(sources, budget=RUN_BUDGET, max_workers=FETCH_WORKERS, limit=ITEMS_PER_FEED, fetch=fetch_and_parse):
+    """Fetch and parse every feed in parallel within one global time budget.
+
+    Returns {(category, source_name): [parsed items]}. Feeds still running
+    when the budget expires are reported and left out; their worker threads
+    are abandoned (each is bounded by its own socket timeout).
+    """
+    jobs = [(category, source_name, url) for category, feeds in sources.items() for source_name, url in feeds]
+    if not jobs:
+        return {}
+    deadline = time.monotonic() + budget
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(jobs)))
+    futures = {
+        pool.submit(fetch, url, min(FETCH_TIMEOUT, budget), limit): (category, source_name)
+        for category, source_name, url in jobs
+    }
+    results = {}
+    try:
+        for fut in as_completed(futures, timeout=max(0, deadline - time.monotonic())):
+            key = futures[fut]
+            try:
+                results[key] = fut.result()
+            except Exception as e:
+                print(f"Warning: failed to ingest {key[1]}: {e}")
+    except FuturesTimeout:
+        late = [futures[f][1] for f in futures if not f.done()]
+        print(f"Warning: run budget of {budget}s exhausted; skipping {', '.join(late)}")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+@joblock.exclusive('news')
+@metrics.run('news')
+@profiler.profile('news')
 def run_once():
     all_records = []
+    cache = FeedCache(FEED_CACHE_PATH)
+    feeds = fetch_all(SOURCES, fetch=partial(fetch_and_parse, cache=cache))
+    cache.save()
+
+    # look up what we already processed so known articles keep their stored
+    # summary, and new ones can be checked against recent titles for near-duplicates
+    conn = db.connect(DB)
+    try:
+        ensure_news_schema(conn)
+        known = known_news(conn, {fingerprint(p.get('link'), p.get('title')) for parsed in feeds.values() for p in parsed})
+        near = near_duplicate_index(conn)
+    finally:
+        conn.close()
+
+    skipped = 0
+    changed_categories = []
     for category, sources in SOURCES.items():
         items_acc = []
         for source_name, url in sources:
-            raw = fetch_rss(url)
-            if not raw:
+            parsed = feeds.get((category, source_name))
+            if not parsed:
                 continue
-            parsed = parse_rss_feed(raw, limit=6)
             for p in parsed:
-                fetched_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-                summary = short_summary(p.get('description',''), 2)
-                rec = generate_recommendation(category, p.get('title',''))
-                excerpt = (p.get('description','')[:300] + '...') if p.get('description') else ''
+                fp = fingerprint(p.get('link'), p.get('title'))
+                prev = known.get(fp)
+                if prev is None:
+                    if near.find(p.get('title', ''), exclude=fp, source=source_name) is not None:
+                        # same story already seen from another source
+                        skipped += 1
+                        continue
+                    near.add(fp, p.get('title', ''), source=source_name)
+                    prev = {
+                        'fetched_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+                        'summary': short_summary(p.get('description',''), 2),
+                        'recommendation': generate_recommendation(category, p.get('title','')),
+                        'excerpt': (p.get('description','')[:300] + '...') if p.get('description') else '',
+                    }
                 item = {
                     'category': category,
                     'title': p.get('title',''),
                     'source': source_name,
                     'link': p.get('link',''),
-                    'fetched_at': fetched_at,
-                    'summary': summary,
+                    'fetched_at': prev['fetched_at'],
+                    'summary': prev['summary'],
                     'tags': [],
-                    'recommendation': rec,
-                    'excerpt': excerpt
+                    'recommendation': prev['recommendation'],
+                    'excerpt': prev['excerpt']
                 }
                 items_acc.append(item)
         # dedupe and keep latest 20
         items_acc = dedupe_keep_latest(items_acc)[:20]
         all_records.extend(items_acc)
         # write public JSON for category
-        write_public_json(category, items_acc)
+        if write_public_json(category, items_acc):
+            changed_categories.append(category)
 
-    # store into DB
-    store_news(all_records)
-    print(f'Fetched total news items: {len(all_records)}')
+    # store into DB (already-known articles are ignored by the unique fingerprint)
+    added = store_news(all_records)
+    print(f'Fetched total news items: {len(all_records)} ({added} new, {skipped} near-duplicates skipped)')
+    if changed_categories:
+        publish.enqueue(f"news: {', '.join(changed_categories)}")
+    publish.flush()
 
 if __name__ == '__main__':
     run_once()
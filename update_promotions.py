@@ -1,50 +1,53 @@
-import sqlite3
 import datetime
-import os
+import db
+import joblock
+import metrics
+import publish
 
 # Configuration
-DB_PATH = '/home/joe/.openclaw/workspace/joeclaw.db'
+DB_PATH = db.DB_PATH
 
+INSERT_PROMOTION = '''
+    INSERT INTO promotions (platform, name, deal_price, original_price, url)
+    VALUES (:platform, :name, :deal_price, :original_price, :url)
+'''
+
+@metrics.timed('update_db')
 def update_db(promotions):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    # Enable WAL for better concurrency (recommended)
+    metrics.annotate(items=len(promotions))
+    # connect() enables WAL, busy timeout etc. for every job
+    conn = db.connect(DB_PATH)
     try:
-        cursor.execute("PRAGMA journal_mode=WAL;")
-    except Exception:
-        pass
-    # Create table if not exists just in case
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS promotions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            platform TEXT,
-            name TEXT,
-            deal_price TEXT,
-            original_price TEXT,
-            url TEXT,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    # Trigger: ensure updated_at is set to CURRENT_TIMESTAMP on UPDATE when caller doesn't set it
-    cursor.execute('''
-        CREATE TRIGGER IF NOT EXISTS promotions_set_updated_at
-        AFTER UPDATE ON promotions
-        FOR EACH ROW
-        WHEN NEW.updated_at = OLD.updated_at
-        BEGIN
-            UPDATE promotions SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
-        END;
-    ''')
-    # Clear old promotions
-    cursor.execute('DELETE FROM promotions')
-    for promo in promotions:
-        cursor.execute('''
-            INSERT INTO promotions (platform, name, deal_price, original_price, url)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (promo['platform'], promo['name'], promo['deal_price'], promo['original_price'], promo['url']))
-    conn.commit()
-    conn.close()
+        with db.transaction(conn):
+            # Create table if not exists just in case
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS promotions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    platform TEXT,
+                    name TEXT,
+                    deal_price TEXT,
+                    original_price TEXT,
+                    url TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            # Trigger: ensure updated_at is set to CURRENT_TIMESTAMP on UPDATE when caller doesn't set it
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS promotions_set_updated_at
+                AFTER UPDATE ON promotions
+                FOR EACH ROW
+                WHEN NEW.updated_at = OLD.updated_at
+                BEGIN
+                    UPDATE promotions SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+                END;
+            ''')
+            # Replace old promotions in the same transaction, so readers never see an empty table
+            conn.execute('DELETE FROM promotions')
+            conn.executemany(INSERT_PROMOTION, promotions)
+    finally:
+        conn.close()
 
+@metrics.timed('find_deals', items=len)
 def find_deals():
     # In a real environment, this script would be part of a larger system or 
     # use the tools provided to the agent. Since this is a background script 
@@ -78,21 +81,32 @@ def find_deals():
     ]
     return deals
 
-if __name__ == "__main__":
+@joblock.exclusive('promotions')
+@metrics.run('promotions')
+def main(regenerate_html=True):
     print(f"[{datetime.datetime.now()}] Starting promotion update...")
     try:
         deals = find_deals()
         update_db(deals)
+        publish.enqueue('promotions')
         print(f"[{datetime.datetime.now()}] Successfully updated {len(deals)} promotions.")
 
         # Regenerate static HTML so website reflects the latest promotions (best-effort)
+        if not regenerate_html:
+            return
         try:
-            import sys, subprocess
-            script_path = os.path.join(os.path.dirname(__file__), 'update_html.py')
-            subprocess.run([sys.executable, script_path], check=False)
-            print(f"[{datetime.datetime.now()}] update_html.py executed (static page regenerated).")
+            # run in-process (no extra interpreter)
+            from update_html import generate_html
+            generate_html()
+            print(f"[{datetime.datetime.now()}] generate_html() executed (static page regenerated).")
         except Exception as e:
             print(f"[{datetime.datetime.now()}] Warning: failed to regenerate index.html: {e}")
 
     except Exception as e:
+        metrics.fail(e)
         print(f"[{datetime.datetime.now()}] Error: {e}")
+    finally:
+        publish.flush()
+
+if __name__ == "__main__":
+    main()